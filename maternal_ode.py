@@ -0,0 +1,358 @@
+import time
+import warnings
+import numpy as np
+from scipy.integrate import odeint, solve_ivp
+
+# Parámetros mejorados según el documento
+PARAMS = {
+    # Sistema inmunitario materno
+    "IgG_maternal_init": 1.2,       # Nivel inicial IgG1 (principal transferida)
+    "decay_maternal": 0.033,        # Vida media 21 días (ln(2)/21 ≈ 0.033)
+    "IgA_lactation": 0.8,           # Nivel constante durante lactancia
+
+    # Componentes inmunológicos bebé
+    "k_dendritic": 0.4,             # Activación células dendríticas
+    "k_T_activation": 0.25,         # Activación linfocitos T CD4+
+    "k_B_proliferation": 0.15,      # Proliferación linfocitos B
+    "decay_IgG": 0.015,             # Vida media IgG bebé (~46 días)
+    "maturation_factor": 0.002,     # Maduración gradual del sistema
+
+    # Vacunación
+    "doses": [60, 120, 360],        # Esquema 2+1 (2, 4, 12 meses)
+    "adjuvant_boost": 1.5,          # Potenciación por adyuvantes
+
+    # Correlatos de protección por serotipo (µg/ml)
+    "thresholds": {
+        "1": 0.35, "5": 0.23,
+        "6B": 0.10, "19A": 0.12
+    }
+}
+
+# Orden de las componentes del estado
+STATE = ("IgG_maternal", "dendritic", "T_cells", "B_cells", "IgG_baby_1", "IgG_baby_6B")
+N_STATE = len(STATE)
+
+def immune_response(y, t, params):
+    """Lado derecho escalar original (un solo bebé), con la firma de odeint."""
+    IgG_maternal, dendritic, T_cells, B_cells, IgG_baby_1, IgG_baby_6B = y
+
+    # Efecto blunting (supresión por IgG materna)
+    blunting = 1 - (IgG_maternal/params["IgG_maternal_init"])
+
+    # Maduración progresiva del sistema inmunitario
+    maturation = 1 + params["maturation_factor"] * t
+
+    # Señal de vacunación (con adyuvantes)
+    vaccine_signal = 0
+    for dose in params["doses"]:
+        if 0 < t - dose < 7:
+            vaccine_signal = params["adjuvant_boost"]
+
+    # Ecuaciones diferenciales
+    dIgG_maternal = -params["decay_maternal"] * IgG_maternal
+
+    ddendritic = (params["k_dendritic"] * vaccine_signal
+                 - 0.1 * dendritic)  # Decaimiento células dendríticas
+
+    dT = (params["k_T_activation"] * dendritic * maturation
+         - 0.05 * T_cells)
+
+    dB = (blunting * params["k_B_proliferation"] * T_cells * vaccine_signal
+         - 0.07 * B_cells)
+
+    # Producción de anticuerpos para diferentes serotipos
+    dIgG1 = 0.3 * B_cells * (IgG_baby_1 < params["thresholds"]["1"]) - params["decay_IgG"] * IgG_baby_1
+
+    dIgG6B = 0.15 * B_cells * (IgG_baby_6B < params["thresholds"]["6B"]) - params["decay_IgG"] * IgG_baby_6B
+
+    return [dIgG_maternal, ddendritic, dT, dB, dIgG1, dIgG6B]
+
+def stack_params(params_list):
+    """
+    Apila parámetros de varios bebés en arreglos.
+
+    Los escalares quedan de forma (n,), los umbrales como {serotipo: (n,)} y las dosis
+    como (n, max_dosis), rellenando con NaN los esquemas más cortos (una dosis NaN
+    nunca activa la señal de vacunación).
+    """
+    scalars = [k for k, v in params_list[0].items() if np.ndim(v) == 0 and not isinstance(v, dict)]
+    stacked = {k: np.array([p[k] for p in params_list], dtype=np.float64) for k in scalars}
+    stacked["thresholds"] = {
+        sero: np.array([p["thresholds"][sero] for p in params_list], dtype=np.float64)
+        for sero in params_list[0]["thresholds"]
+    }
+    n_doses = max(len(p["doses"]) for p in params_list)
+    stacked["doses"] = np.full((len(params_list), n_doses), np.nan)
+    for i, p in enumerate(params_list):
+        stacked["doses"][i, :len(p["doses"])] = p["doses"]
+    return stacked
+
+def sweep(params=PARAMS, n=None, **overrides):
+    """
+    Parámetros apilados de `n` bebés que comparten `params` salvo por `overrides`.
+
+    Ejemplo:
+        sweep(IgG_maternal_init=np.linspace(0.2, 2.0, 1000))
+        sweep(n=2, doses=[[60, 120, 360], [60, 120, 180, 360]])
+    """
+    if n is None:
+        n = max(len(v) for v in overrides.values())
+    params_list = [dict(params) for _ in range(n)]
+    for key, values in overrides.items():
+        for p, value in zip(params_list, values):
+            p[key] = value
+    return stack_params(params_list)
+
+def _is_stacked(params):
+    return np.ndim(params["IgG_maternal_init"]) > 0
+
+def initial_state(params):
+    """Estado inicial (n, 6): IgG materna en su nivel inicial y todo lo demás en cero."""
+    y0 = np.zeros((len(params["IgG_maternal_init"]), N_STATE))
+    y0[:, 0] = params["IgG_maternal_init"]
+    return y0
+
+def vaccine_signal(t, params):
+    """Señal de vacunación (n,): adjuvant_boost si t cae en la semana posterior a alguna dosis."""
+    since_dose = t - params["doses"]
+    active = ((since_dose > 0) & (since_dose < 7)).any(axis=1)
+    return np.where(active, params["adjuvant_boost"], 0.0)
+
+def immune_response_batch(Y, t, params):
+    """
+    Lado derecho vectorizado: mismo modelo que `immune_response` para un estado (n, 6)
+    y parámetros apilados (ver `stack_params`).
+    """
+    producing = Y[:, 4:] < _thresholds(params)
+    return _derivatives(Y, t, params, vaccine_signal(t, params), producing)
+
+def _thresholds(params):
+    # Umbrales de las dos columnas de IgG del bebé, (n, 2)
+    return np.stack([params["thresholds"]["1"], params["thresholds"]["6B"]], axis=1)
+
+# Tasa de producción de IgG por célula B para las columnas IgG_baby_1 e IgG_baby_6B
+IGG_RATES = np.array([0.3, 0.15])
+
+def _derivatives(Y, t, params, signal, producing):
+    IgG_maternal, dendritic, T_cells, B_cells = Y[:, 0], Y[:, 1], Y[:, 2], Y[:, 3]
+    blunting = 1 - IgG_maternal / params["IgG_maternal_init"]
+    maturation = 1 + params["maturation_factor"] * t
+
+    dY = np.empty_like(Y)
+    dY[:, 0] = -params["decay_maternal"] * IgG_maternal
+    dY[:, 1] = params["k_dendritic"] * signal - 0.1 * dendritic
+    dY[:, 2] = params["k_T_activation"] * dendritic * maturation - 0.05 * T_cells
+    dY[:, 3] = blunting * params["k_B_proliferation"] * T_cells * signal - 0.07 * B_cells
+    dY[:, 4:] = IGG_RATES * B_cells[:, None] * producing - params["decay_IgG"][:, None] * Y[:, 4:]
+    return dY
+
+def solve(params, t, y0=None, method="RK45", **solver_kwargs):
+    """
+    Integra el modelo para uno o muchos bebés a la vez.
+
+    Todos los estados se resuelven en una sola llamada a solve_ivp sobre el vector
+    aplanado (n * 6), con un paso adaptativo común. Por defecto usa RK45 explícito: con
+    los umbrales de producción de IgG la solución se queda pegada al umbral y LSODA
+    (odeint) se detiene ahí con "Excess work done".
+
+    Args:
+        params: un diccionario como PARAMS o parámetros apilados (ver `stack_params`).
+        t: tiempos de salida (días), crecientes.
+        y0: estado inicial (n, 6); por defecto `initial_state(params)`.
+        method, **solver_kwargs: se pasan a scipy.integrate.solve_ivp.
+
+    Returns:
+        np.ndarray (n, len(t), 6) con las componentes en el orden de STATE.
+    """
+    if not _is_stacked(params):
+        params = stack_params([params])
+    y0 = initial_state(params) if y0 is None else np.asarray(y0, dtype=np.float64)
+    n = len(y0)
+    t = np.asarray(t, dtype=np.float64)
+
+    def rhs(t, y):
+        return immune_response_batch(y.reshape(n, N_STATE), t, params).ravel()
+
+    result = solve_ivp(rhs, (t[0], t[-1]), y0.ravel(), method=method, t_eval=t, **solver_kwargs)
+    if not result.success:
+        raise RuntimeError(result.message)
+    return result.y.reshape(n, N_STATE, len(t)).transpose(0, 2, 1)
+
+# Régimen de cada columna de IgG del bebé en `solve_piecewise`
+BELOW, SLIDING, ABOVE = 0, 1, 2
+
+def _breakpoints(params, t0, t1):
+    # Bordes de las ventanas de dosis [dosis, dosis + 7] de todo el lote dentro de (t0, t1)
+    doses = params["doses"][~np.isnan(params["doses"])]
+    edges = np.unique(np.concatenate([doses, doses + 7]))
+    return np.concatenate([[t0], edges[(edges > t0) & (edges < t1)], [t1]])
+
+def _margins(Y, params, modes, thresholds):
+    # Distancia de cada columna de IgG a su próximo cambio de régimen; todas >= 0
+    igg = Y[:, 4:]
+    net_at_threshold = IGG_RATES * Y[:, 3:4] - params["decay_IgG"][:, None] * thresholds
+    return np.select([modes == BELOW, modes == ABOVE], [thresholds - igg, igg - thresholds], net_at_threshold)
+
+# Histéresis relativa de los eventos de una columna que acaba de cambiar de régimen
+HYSTERESIS = 1e-9
+
+def _rising(Y, t, params, signal, thresholds):
+    # Columnas cuya IgG, puesta en el umbral y produciendo, sube: dI/dt > 0, o dI/dt = 0
+    # (hasta redondeo) con las células B creciendo, que la hacen positiva enseguida
+    at_threshold = Y.copy()
+    at_threshold[:, 4:] = thresholds
+    dY = _derivatives(at_threshold, t, params, signal, np.ones_like(thresholds, dtype=bool))
+    rate = dY[:, 4:]
+    scale = 1e-12 * (IGG_RATES * np.abs(Y[:, 3:4]) + params["decay_IgG"][:, None] * thresholds)
+    return (rate > scale) | ((rate >= -scale) & (dY[:, 3:4] > 0))
+
+def solve_piecewise(params, t, y0=None, method="RK45", **solver_kwargs):
+    """
+    Como `solve`, pero respetando las discontinuidades del modelo.
+
+    - El eje de tiempo se corta en el inicio y el fin de cada ventana de dosis, así la
+      señal de vacunación es constante dentro de cada tramo y el paso adaptativo no
+      puede saltarse una ventana.
+    - Los umbrales de producción de IgG se tratan como eventos. Cada columna de IgG del
+      bebé está en un régimen: bajo el umbral (produce), sobre el umbral (no produce)
+      o deslizándose sobre él. Al llegar al umbral con producción neta positiva, la IgG
+      se queda en el umbral (dI/dt = 0), que es el límite de lo que el modelo original
+      hace encendiendo y apagando la producción en cada paso. Sale del umbral cuando la
+      producción de las células B ya no compensa el decaimiento.
+
+    Cada cambio de régimen de cualquier bebé reinicia el integrador para todo el lote,
+    así que el costo crece con la cantidad de cambios del lote, no solo con su tamaño:
+    - Lotes homogéneos, p. ej. un barrido de IgG_maternal_init con 200 bebés: cambian
+      pocas veces y es más rápido que `solve` (0.09 s contra 0.35 s).
+    - Lotes heterogéneos, p. ej. 300 bebés con adjuvant_boost, decay_IgG y
+      k_B_proliferation al azar: cada bebé cruza sus umbrales en otro momento y es
+      mucho más lento (6 s contra 0.6 s).
+    A cambio, la IgG se queda exactamente en el umbral. `solve` integra una sola vez
+    sobre la grilla `t` con el encendido y apagado del modelo original, y con su paso
+    por defecto pasa el umbral por hasta ~0.1 (converge a este resultado achicando
+    max_step).
+
+    Returns:
+        np.ndarray (n, len(t), 6) con las componentes en el orden de STATE.
+    """
+    if not _is_stacked(params):
+        params = stack_params([params])
+    y = (initial_state(params) if y0 is None else np.asarray(y0, dtype=np.float64)).copy()
+    n = len(y)
+    t = np.asarray(t, dtype=np.float64)
+    thresholds = _thresholds(params)
+    modes = np.where(y[:, 4:] < thresholds, BELOW, ABOVE)
+    out = np.empty((n, len(t), N_STATE))
+    out[:, 0] = y
+
+    edges = _breakpoints(params, t[0], t[-1])
+    for start, end in zip(edges[:-1], edges[1:]):
+        # La señal no cambia dentro del tramo: se evalúa en su punto medio
+        signal = vaccine_signal((start + end) / 2, params)
+        t_cur = start
+        fresh = np.zeros_like(modes, dtype=bool)  # columnas que acaban de cambiar de régimen
+        stalls = 0
+        while t_cur < end:
+            producing = modes == BELOW
+            sliding = modes == SLIDING
+            # Histéresis: una columna recién cambiada está justo en su borde (margen 0) y
+            # no debe volver a disparar el evento en el mismo instante
+            hysteresis = np.where(fresh, HYSTERESIS * (1 + np.abs(thresholds)), 0.0)
+
+            def rhs(t, flat):
+                dY = _derivatives(flat.reshape(n, N_STATE), t, params, signal, producing)
+                dY[:, 4:][sliding] = 0.0
+                return dY.ravel()
+
+            def event(t, flat):
+                return (_margins(flat.reshape(n, N_STATE), params, modes, thresholds) + hysteresis).min()
+            event.terminal = True
+            event.direction = -1
+
+            # Tiempos de salida del tramo más su borde, para tener el estado al final
+            inside = np.flatnonzero((t >= t_cur) & (t <= end))
+            t_eval = np.unique(np.append(t[inside], end))
+            result = solve_ivp(rhs, (t_cur, end), y.ravel(), method=method, t_eval=t_eval, events=event, **solver_kwargs)
+            if result.status == -1:
+                raise RuntimeError(result.message)
+            if len(result.t):
+                reached = np.isin(t[inside], result.t)
+                out[:, inside[reached]] = result.y[:, np.isin(result.t, t[inside])].reshape(n, N_STATE, -1).transpose(0, 2, 1)
+
+            if result.status == 0:
+                y = result.y[:, -1].reshape(n, N_STATE)
+                t_cur = end
+                continue
+
+            # Evento: cambian de régimen las columnas que llegaron a su borde
+            t_event = result.t_events[0][0]
+            stalls = stalls + 1 if t_event <= t_cur else 0
+            if stalls > modes.size:
+                raise RuntimeError(f"solve_piecewise no avanza en t={t_cur}: los regímenes cambian sin que corra el tiempo")
+            t_cur = t_event
+            y = result.y_events[0][0].reshape(n, N_STATE).copy()
+            margins = _margins(y, params, modes, thresholds) + hysteresis
+            switch = margins <= max(1e-9, 1e-9 * np.abs(thresholds).max())
+            switch |= margins == margins.min()
+            y[:, 4:][switch] = thresholds[switch]
+            # El régimen nuevo sale del signo real de dI/dt en el umbral con producción:
+            # si sube, la IgG se desliza sobre el umbral; si baja, queda por debajo
+            modes = np.where(switch, np.where(_rising(y, t_cur, params, signal, thresholds), SLIDING, BELOW), modes)
+            fresh = switch
+    return out
+
+def protection_day(levels, t, threshold):
+    """Primer tiempo en que cada fila de `levels` (n, len(t)) alcanza `threshold`; NaN si nunca."""
+    reached = np.asarray(levels) >= np.asarray(threshold).reshape(-1, 1)
+    return np.where(reached.any(axis=1), np.asarray(t)[reached.argmax(axis=1)], np.nan)
+
+def check_piecewise(tol=0.01):
+    """
+    Regresión de `solve_piecewise`: un lote de dos bebés que solo difieren en
+    adjuvant_boost (antes quedaba en un ciclo de eventos sin avanzar) tiene que
+    terminar y coincidir con `solve` de paso fino (max_step=0.02) hasta `tol`.
+    """
+    t = np.linspace(0, 365, 366)
+    params = sweep(adjuvant_boost=[0.9391, 1.2493])
+    error = np.abs(solve_piecewise(params, t) - solve(params, t, max_step=0.02)).max()
+    if error > tol:
+        raise AssertionError(f"solve_piecewise difiere de solve en {error:.4f} (> {tol})")
+    return error
+
+def compare_solvers(params=PARAMS, t=None, repeat=3):
+    """
+    Tiempos de un bebé con la llamada única a odeint del script original, con `solve`
+    y con `solve_piecewise`.
+
+    Returns:
+        lista de {"solver", "seconds" (mínimo de `repeat`), "ok", "final" (IgG del
+        bebé al final: serotipos 1 y 6B)}.
+    """
+    t = np.linspace(0, 365, 365) if t is None else t
+    y0 = initial_state(stack_params([params]))[0]
+
+    def run_odeint():
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            solution, info = odeint(immune_response, y0, t, args=(params,), full_output=True)
+        return solution, info["message"] == "Integration successful."
+
+    solvers = {
+        "odeint": run_odeint,
+        "solve": lambda: (solve(params, t)[0], True),
+        "solve_piecewise": lambda: (solve_piecewise(params, t)[0], True),
+    }
+    rows = []
+    for name, run in solvers.items():
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            solution, ok = run()
+            times.append(time.perf_counter() - start)
+        rows.append({"solver": name, "seconds": min(times), "ok": ok, "final": solution[-1, 4:].tolist()})
+    return rows
+
+if __name__ == "__main__":
+    print(f"check_piecewise: diferencia máxima con solve {check_piecewise():.4f}")
+    for row in compare_solvers():
+        print(f"{row['solver']:16s} {row['seconds']:8.4f} s  ok={row['ok']}  IgG final={row['final']}")
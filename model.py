@@ -33,14 +33,16 @@ class AffinityCalculator:
     @staticmethod
     def compute(antigen: Antigen, bcells: List[BCell]) -> List[float]:
         """Calcula afinidad para todas las células B"""
-        return [
-            np.exp(-np.sqrt(
-                (antigen.charge - b.receptors[0])**2 +
-                (antigen.hydrophobicity - b.receptors[1])**2 +
-                (antigen.size - b.receptors[2])**2
-            ))
-            for b in bcells
-        ]
+        if not bcells:
+            return []
+        receptors = np.array([b.receptors for b in bcells], dtype=np.float64)
+        return AffinityCalculator.compute_array(antigen, receptors).tolist()
+
+    @staticmethod
+    def compute_array(antigen: Antigen, receptors: np.ndarray) -> np.ndarray:
+        """Afinidad de un arreglo de receptores (..., 3); devuelve la forma (...)"""
+        target = np.array([antigen.charge, antigen.hydrophobicity, antigen.size])
+        return np.exp(-np.sqrt(((receptors[..., :3] - target) ** 2).sum(axis=-1)))
 
 # =====================
 # MÓDULO DE MUTACIÓN
@@ -64,6 +66,11 @@ class MutationEngine:
             clones=cell.clones + 1
         )
 
+    def mutate_array(self, receptors: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        """Igual que `mutate` para un arreglo de receptores (..., 3), todo de una vez"""
+        mutate = rng.random(receptors.shape) < self.rate
+        return receptors + np.where(mutate, rng.normal(0, 0.1, receptors.shape), 0.0)
+
 # =====================
 # MÓDULO DE SELECCIÓN
 # =====================
@@ -178,6 +185,118 @@ class ImmuneSystem:
                 if np.random.random() > 0.01 * days  # 1% de muerte celular por día
             ]
 
+# =====================
+# COHORTE VECTORIZADA
+# =====================
+
+class CohortImmuneSystem:
+    """
+    Mismo modelo que ImmuneSystem para `n_individuals` bebés a la vez.
+
+    Todo se guarda por serotipo como arreglos con el eje de individuos primero:
+    niveles de IgG (n,), conteos de memoria y plasmáticas (n,). En el centro germinal
+    los receptores son (n, capacidad, 3) con una máscara de células activas, porque
+    cada individuo conserva un número distinto de células.
+
+    Las células de memoria y plasmáticas solo importan por cuántas hay, así que los
+    pools son conteos y el recambio es una extracción binomial por individuo.
+    """
+
+    def __init__(self, n_individuals: int, mutation_rate: float = 0.1, rng: np.random.Generator = None):
+        self.n = n_individuals
+        self.memory_pool: Dict[str, np.ndarray] = {}     # Conteo de memoria (n,) por serotipo
+        self.plasma_cells: Dict[str, np.ndarray] = {}    # Conteo de plasmáticas (n,) por serotipo
+        self.antibody_levels: Dict[str, np.ndarray] = {} # IgG (n,) por serotipo
+        self.rng = np.random.default_rng() if rng is None else rng
+
+        # Módulos
+        self.mutator = MutationEngine(mutation_rate)
+
+    def initialize_serotype(self, serotype: str):
+        """Prepara estructuras para un nuevo serotipo"""
+        self.memory_pool[serotype] = np.zeros(self.n, dtype=np.int64)
+        self.plasma_cells[serotype] = np.zeros(self.n, dtype=np.int64)
+        self.antibody_levels[serotype] = np.zeros(self.n)
+
+    def generate_naive_cells(self, antigen: Antigen, n_cells: int = 10) -> np.ndarray:
+        """Receptores naive (n, n_cells, 3) alrededor del antígeno"""
+        center = np.array([antigen.charge, antigen.hydrophobicity, antigen.size])
+        return center + self.rng.normal(0, 1, (self.n, n_cells, 3)) * np.array([0.2, 0.2, 0.1])
+
+    def germinal_center_reaction(self, antigen: Antigen, receptors: np.ndarray, cycles: int = 3):
+        """
+        Mutación, selección y proliferación de `ImmuneSystem.germinal_center_reaction`.
+
+        Las dos mutantes de la proliferación de cada ciclo ocupan dos columnas nuevas al
+        final, así el orden de las columnas activas es el de la lista original. Como en
+        el modelo original, esas mutantes no se evalúan hasta el ciclo siguiente (su
+        afinidad queda en 0).
+
+        Returns:
+            (receptores (n, capacidad, 3), afinidades (n, capacidad), activas (n, capacidad))
+        """
+        n, n_cells, _ = receptors.shape
+        capacity = n_cells + 2 * cycles
+        cells = np.zeros((n, capacity, 3))
+        cells[:, :n_cells] = receptors
+        affinity = np.zeros((n, capacity))
+        active = np.zeros((n, capacity), dtype=bool)
+        active[:, :n_cells] = True
+        rows = np.arange(n)
+
+        for c in range(cycles):
+            # 1. Mutación
+            cells = self.mutator.mutate_array(cells, self.rng)
+
+            # 2. Selección
+            affinity = np.where(active, AffinityCalculator.compute_array(antigen, cells), 0.0)
+            active &= affinity > 0.7
+
+            # 3. Proliferación: una mutante de cada una de las dos primeras seleccionadas
+            rank = np.cumsum(active, axis=1)
+            for k in range(2):
+                has = rank[:, -1] > k
+                parent = np.argmax(rank == k + 1, axis=1)
+                column = n_cells + 2 * c + k
+                cells[has, column] = self.mutator.mutate_array(cells[rows[has], parent[has]], self.rng)
+                affinity[has, column] = 0.0
+                active[has, column] = True
+
+        return cells, affinity, active
+
+    def vaccinate(self, antigen: Antigen, dose: int = 1):
+        """Administra una dosis de vacuna a toda la cohorte"""
+        if antigen.serotype not in self.memory_pool:
+            self.initialize_serotype(antigen.serotype)
+
+        for _ in range(dose):
+            naive_cells = self.generate_naive_cells(antigen)
+            _, affinity, active = self.germinal_center_reaction(antigen, naive_cells)
+
+            # Diferenciación: alta afinidad -> memoria, el resto -> plasmablastos
+            memory = active & (affinity > 0.8)
+            self.memory_pool[antigen.serotype] += memory.sum(axis=1)
+            self.plasma_cells[antigen.serotype] += (active & ~memory).sum(axis=1)
+
+    def update_antibodies(self, days: int = 1):
+        """Actualiza niveles de anticuerpos en el tiempo"""
+        decay_factor = np.exp(-0.033 * days)  # 0.033 ≈ ln(2)/21
+        for serotype in self.plasma_cells:
+            plasma_production = self.plasma_cells[serotype] * 0.1
+            memory_production = self.memory_pool[serotype] * 0.02
+            self.antibody_levels[serotype] = (
+                (self.antibody_levels[serotype] + plasma_production + memory_production) * decay_factor
+            )
+
+    def time_step(self, days: int = 1):
+        """Avanza la simulación en el tiempo"""
+        self.update_antibodies(days)
+
+        # Turnover: 1% de muerte celular por día, binomial por individuo
+        survival = max(0.0, 1 - 0.01 * days)
+        for serotype in self.plasma_cells:
+            self.plasma_cells[serotype] = self.rng.binomial(self.plasma_cells[serotype], survival)
+
 # =====================
 # SIMULACIÓN Y VISUALIZACIÓN
 # =====================
@@ -279,6 +398,38 @@ def run_daily_simulation():
     plt.grid(True, alpha=0.3)
     plt.show()
 
+def run_daily_cohort(n_individuals: int = 1000, total_days: int = 720, seed=None):
+    """
+    `run_daily_simulation` para una cohorte completa, sin gráfico.
+
+    Returns:
+        (time_points, {serotipo: arreglo (n_individuals, total_days) de IgG})
+    """
+    system = CohortImmuneSystem(n_individuals, rng=np.random.default_rng(seed))
+    pcv_serotypes = [
+        Antigen(serotype="4", charge=0.7, hydrophobicity=0.6, size=0.8),
+        Antigen(serotype="6B", charge=0.5, hydrophobicity=0.7, size=1.0),
+        Antigen(serotype="23F", charge=0.65, hydrophobicity=0.55, size=0.75)
+    ]
+    days_schedule = [90, 180, 365]
+    time_points = list(range(total_days))
+    antibody_levels = {s.serotype: np.empty((n_individuals, total_days)) for s in pcv_serotypes}
+
+    for antigen in pcv_serotypes:
+        system.vaccinate(antigen, dose = 0)
+
+    for current_day in range(total_days):
+        system.time_step(days=1)
+
+        if current_day in days_schedule:
+            for antigen in pcv_serotypes:
+                system.vaccinate(antigen)
+
+        for serotype in antibody_levels:
+            antibody_levels[serotype][:, current_day] = system.antibody_levels[serotype]
+
+    return time_points, antibody_levels
+
 
 if __name__ == "__main__":
     run_daily_simulation()
\ No newline at end of file
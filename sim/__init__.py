@@ -0,0 +1,10 @@
+# __init__.py
+# Los módulos del simulador se importan entre sí sin paquete (`from config import ...`),
+# como cuando se corren desde sim/; al importar el paquete (`python -m sim`) se agrega
+# este directorio al path para que esos imports funcionen desde cualquier directorio.
+import os
+import sys
+
+_SIM_DIR = os.path.dirname(os.path.abspath(__file__))
+if _SIM_DIR not in sys.path:
+    sys.path.insert(0, _SIM_DIR)
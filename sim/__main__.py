@@ -0,0 +1,133 @@
+# __main__.py
+"""
+Línea de comandos del simulador.
+
+Uso (desde la raíz del repositorio, o con `python ruta/a/sim ...` desde cualquier lado):
+    python -m sim run --seed 1 --plot
+    python -m sim ensemble --times 48 --workers 8 --seed 0 --output res.npy
+    python -m sim calibrate --method surrogate --iterations 20 --checkpoint cal.pkl
+    python -m sim bench --quick --output bench.json
+
+`--set clave=valor` (repetible) y `--params archivo.json` modifican SIMULATION_PARAMS.
+matplotlib, pandas y scipy se importan solo en los subcomandos que los usan.
+"""
+import argparse
+import json
+import os
+import sys
+
+if __package__ in (None, ""):
+    # `python sim/` o `python sim/__main__.py`: el directorio ya está en el path
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+else:
+    import sim  # noqa: F401  (agrega sim/ al path, ver __init__.py)
+
+def build_params(args):
+    """SIMULATION_PARAMS con los cambios de --params y --set."""
+    from config import SIMULATION_PARAMS
+    params = dict(SIMULATION_PARAMS)
+    if args.params:
+        with open(args.params) as f:
+            params.update(json.load(f))
+    for item in args.set:
+        key, _, value = item.partition("=")
+        if key not in SIMULATION_PARAMS:
+            raise SystemExit(f"parámetro desconocido: {key}")
+        try:
+            params[key] = json.loads(value)
+        except json.JSONDecodeError:
+            params[key] = value  # texto sin comillas, p. ej. --set gc_backend=objects
+    return params
+
+def cmd_run(args):
+    from main import main
+    time_points, levels = main(profile_path=args.profile, seed=args.seed, params=build_params(args), plot=args.plot)
+    _write_json(args.output, {"days": time_points, "antibody": {s: list(map(float, v)) for s, v in levels.items()}})
+
+def cmd_ensemble(args):
+    import numpy as np
+    from ensemble import run_ensemble
+    from main import SEROTYPES, sample_days
+    params = build_params(args)
+    res = run_ensemble(params, args.times, workers=args.workers, seed=args.seed, cohort=args.cohort, cache=args.cache)
+    if args.output:
+        np.save(args.output, res)
+    mean = np.nanmean(res, axis=0)
+    print("serotipo " + " ".join(f"día {d:>6}" for d in sample_days(params)))
+    for serotype, row in zip(SEROTYPES, mean):
+        print(f"{serotype:8s} " + " ".join(f"{v:10.4f}" for v in row))
+
+def cmd_calibrate(args):
+    import numpy as np
+    from simulated_annealing import recocido_simulado, calibracion_surrogada
+    params = build_params(args)
+    if args.method == "anneal":
+        best, energy, res = recocido_simulado(params, max_iter=args.iterations, workers=args.workers, candidates=args.batch,
+                                              checkpoint=args.checkpoint, seed=args.seed, cohort=args.cohort, cache=args.cache)
+    else:
+        best, energy, res = calibracion_surrogada(params, iterations=args.iterations, batch=args.batch, workers=args.workers,
+                                                  checkpoint=args.checkpoint, seed=args.seed, cohort=args.cohort, cache=args.cache)
+    if args.results:
+        np.save(args.results, res)
+    _write_json(args.output, {"energy": float(energy), "params": best})
+
+def cmd_bench(args):
+    from benchmarks import main
+    main(args.bench_args)
+
+def _write_json(path, data):
+    text = json.dumps(data, indent=2, default=float)
+    if path is None:
+        print(text)
+    else:
+        with open(path, "w") as f:
+            f.write(text)
+
+def parser():
+    root = argparse.ArgumentParser(prog="python -m sim", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = root.add_subparsers(dest="command", required=True)
+
+    def simulation(name, help):
+        sub = commands.add_parser(name, help=help)
+        sub.add_argument("--seed", type=int, default=None)
+        sub.add_argument("--params", help="JSON con parámetros que reemplazan a SIMULATION_PARAMS")
+        sub.add_argument("--set", action="append", default=[], metavar="CLAVE=VALOR", help="cambia un parámetro (valor en JSON)")
+        sub.add_argument("--output", help="archivo de salida (por defecto, la salida estándar)")
+        return sub
+
+    run = simulation("run", "una simulación diaria")
+    run.add_argument("--plot", action="store_true", help="graficar los anticuerpos (importa matplotlib)")
+    run.add_argument("--profile", help="guardar el perfil por fase (ver profiling.Profiler)")
+    run.set_defaults(fn=cmd_run)
+
+    for name, help, fn in (("ensemble", "réplicas en paralelo (ensemble.run_ensemble)", cmd_ensemble),
+                           ("calibrate", "calibración contra los datos (simulated_annealing)", cmd_calibrate)):
+        sub = simulation(name, help)
+        sub.add_argument("--workers", type=int, default=None, help="procesos del pool (por defecto, todos los núcleos)")
+        sub.add_argument("--cohort", action="store_true", help="réplicas como una cohorte virtual")
+        sub.add_argument("--cache", help="base SQLite de corridas (ver cache.RunCache)")
+        sub.set_defaults(fn=fn)
+        if name == "ensemble":
+            sub.add_argument("--times", type=int, default=48, help="número de réplicas")
+        else:
+            sub.add_argument("--method", choices=["anneal", "surrogate"], default="anneal")
+            sub.add_argument("--iterations", type=int, default=100, help="etapas del recocido o iteraciones del sustituto")
+            sub.add_argument("--batch", type=int, default=1, help="candidatos evaluados juntos por etapa")
+            sub.add_argument("--checkpoint", help="ruta del checkpoint (se reanuda si existe)")
+            sub.add_argument("--results", help="archivo .npy para las réplicas del mejor punto")
+
+    bench = commands.add_parser("bench", help="benchmarks (benchmarks.py); los argumentos pasan tal cual", add_help=False)
+    bench.set_defaults(fn=cmd_bench)
+    return root
+
+def main(argv=None):
+    root = parser()
+    args, extra = root.parse_known_args(argv)
+    if args.command == "bench":
+        args.bench_args = extra
+    elif extra:
+        root.error(f"argumentos no reconocidos: {' '.join(extra)}")
+    args.fn(args)
+
+if __name__ == "__main__":
+    main()
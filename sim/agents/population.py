@@ -0,0 +1,72 @@
+# agents/population.py
+from typing import List
+import numpy as np
+from agents.BCell import BCell
+
+class BCellPopulation:
+    """
+    Población de células B almacenada como estructura de arreglos.
+
+    Cada célula es una fila: `receptors` tiene forma (N, receptor_length) y
+    `affinity`, `serotype`, `ids` e `individual` son arreglos paralelos de largo N.
+    Así las etapas del centro germinal (muerte, mutación, recálculo de afinidad) se
+    aplican a toda la población en una sola pasada de NumPy. `individual` indica a qué
+    individuo de una cohorte virtual pertenece cada célula (0 fuera de una cohorte).
+    """
+
+    def __init__(self, receptors, affinity=None, serotype=None, ids=None, individual=None):
+        self.receptors = np.asarray(receptors, dtype=np.float64)
+        n = self.receptors.shape[0]
+        self.affinity = np.zeros(n) if affinity is None else np.asarray(affinity, dtype=np.float64)
+        self.serotype = np.full(n, "", dtype=object) if serotype is None else np.asarray(serotype, dtype=object)
+        self.ids = np.arange(n) if ids is None else np.asarray(ids, dtype=np.int64)
+        self.individual = np.zeros(n, dtype=np.int64) if individual is None else np.asarray(individual, dtype=np.int64)
+
+    @classmethod
+    def empty(cls, receptor_length: int = 5) -> 'BCellPopulation':
+        return cls(np.empty((0, receptor_length)))
+
+    @classmethod
+    def from_bcells(cls, bcells: List[BCell], receptor_length: int = 5) -> 'BCellPopulation':
+        """Convierte una lista de BCell en una población de arreglos."""
+        if len(bcells) == 0:
+            return cls.empty(receptor_length)
+        return cls(
+            receptors=np.array([b.receptors for b in bcells], dtype=np.float64),
+            affinity=np.array([b.affinity for b in bcells], dtype=np.float64),
+            serotype=np.array([b.serotype for b in bcells], dtype=object),
+            ids=np.array([b.id for b in bcells], dtype=np.int64),
+        )
+
+    def to_bcells(self) -> List[BCell]:
+        """Materializa la población como lista de BCell (para los pools)."""
+        return [
+            BCell(id=int(i), receptors=r.tolist(), affinity=float(a), serotype=s)
+            for i, r, a, s in zip(self.ids, self.receptors, self.affinity, self.serotype)
+        ]
+
+    def take(self, index) -> 'BCellPopulation':
+        """Subpoblación dada por un arreglo de índices o una máscara booleana."""
+        return BCellPopulation(
+            self.receptors[index],
+            self.affinity[index],
+            self.serotype[index],
+            self.ids[index],
+            self.individual[index],
+        )
+
+    def concat(self, other: 'BCellPopulation') -> 'BCellPopulation':
+        return BCellPopulation(
+            np.concatenate([self.receptors, other.receptors]),
+            np.concatenate([self.affinity, other.affinity]),
+            np.concatenate([self.serotype, other.serotype]),
+            np.concatenate([self.ids, other.ids]),
+            np.concatenate([self.individual, other.individual]),
+        )
+
+    @property
+    def receptor_length(self) -> int:
+        return self.receptors.shape[1]
+
+    def __len__(self) -> int:
+        return self.receptors.shape[0]
@@ -0,0 +1,242 @@
+# benchmarks.py
+"""
+Benchmarks de los caminos críticos del simulador.
+
+Uso (desde sim/):
+    python benchmarks.py --output bench.json
+    python benchmarks.py --quick --output nuevo.json --compare bench.json
+    python -m sim bench --quick  (desde la raíz del repositorio)
+
+Cada caso se mide `repeat` veces (sin contar la preparación) y se guarda en JSON
+junto con el commit, para comparar corridas entre commits.
+"""
+import argparse
+import importlib.util
+import itertools
+import json
+import os
+import platform
+import subprocess
+import time
+import numpy as np
+from config import SIMULATION_PARAMS
+from agents.antigen import Antigen
+from agents.BCell import BCell
+from environment.germinal_center import GerminalCenter
+from environment.immune_system import ImmuneSystem
+from processes.affinity import compute_affinity, compute_affinity_batch
+from processes.mutation import mutate_bcell, mutate_receptors
+from processes.selection import boltzmann_selection, boltzmann_indices
+
+# Rejilla de parámetros: tamaño de la reserva naive, serotipos y largo del receptor
+GRID = {
+    "pool_size": [1000, 10000, 100000],
+    "n_serotypes": [7, 20],
+    "receptor_length": [5, 20],
+}
+QUICK_GRID = {
+    "pool_size": [1000, 10000],
+    "n_serotypes": [7],
+    "receptor_length": [5],
+}
+
+def make_antigens(n_serotypes, receptor_length, rng):
+    return [
+        Antigen(id=i + 1, serotype=str(i + 1), polysaccharide_ug=2.2, carrier_protein="TT",
+                immunogenicity_factor=1.0, epitope_vector=rng.random(receptor_length).tolist())
+        for i in range(n_serotypes)
+    ]
+
+def make_bcells(n, receptor_length, rng, serotype=""):
+    receptors = rng.random((n, receptor_length))
+    return [BCell(id=i, receptors=receptors[i].tolist(), serotype=serotype) for i in range(n)]
+
+def timeit(fn, setup=None, repeat=5):
+    """Tiempos de `fn(*setup())`; la preparación queda fuera de la medición."""
+    times = []
+    for _ in range(repeat):
+        args = setup() if setup is not None else ()
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    return times
+
+def bench_fill_cgs(pool_size, n_serotypes, receptor_length, params, rng):
+    antigens = make_antigens(n_serotypes, receptor_length, rng)
+
+    def setup():
+        ims = ImmuneSystem(antigens, [], params, rng=rng)
+        ims.bcells_pool = ims.initialize_naive(pool_size, receptor_length)
+        return (ims,)
+    return setup, lambda ims: ims.fillCGs(antigens)
+
+def bench_run_cycle(pool_size, n_serotypes, receptor_length, params, rng, cycles=10):
+    antigen = make_antigens(1, receptor_length, rng)[0]
+
+    def setup():
+        gc = GerminalCenter(id=antigen.id, antigen=antigen, params=params, rng=rng)
+        cells = make_bcells(pool_size, receptor_length, rng, antigen.serotype)
+        affinities = compute_affinity_batch(np.array([b.receptors for b in cells]), antigen.epitope_vector)
+        for b, a in zip(cells, affinities):
+            b.affinity = a
+        gc.seed_naive_cells(cells)
+        return (gc,)
+
+    def run(gc):
+        for _ in range(cycles):
+            gc.run_cycle()
+    return setup, run
+
+def bench_run_cycle_numba(pool_size, n_serotypes, receptor_length, params, rng, cycles=10):
+    # Sin Numba instalado GerminalCenter vuelve a NumPy y mide lo mismo que run_cycle
+    return bench_run_cycle(pool_size, n_serotypes, receptor_length, dict(params, gc_backend="numba"), rng, cycles)
+
+def bench_step(pool_size, n_serotypes, receptor_length, params, rng, days=10, gc_workers=1):
+    # Días de ImmuneSystem después de una dosis, con los CG en secuencia o en hilos
+    antigens = make_antigens(n_serotypes, receptor_length, rng)
+    step_params = dict(params, naive_pool_size=pool_size, gc_workers=gc_workers)
+
+    def setup():
+        ims = ImmuneSystem(antigens, [], step_params, rng=rng)
+        ims.vaccinate(antigens)
+        return (ims,)
+
+    def run(ims):
+        for _ in range(days):
+            ims.step()
+        ims.close()
+    return setup, run
+
+def bench_step_threads(pool_size, n_serotypes, receptor_length, params, rng):
+    return bench_step(pool_size, n_serotypes, receptor_length, params, rng, gc_workers=4)
+
+def bench_boltzmann_selection(pool_size, n_serotypes, receptor_length, params, rng):
+    cells = make_bcells(pool_size, receptor_length, rng)
+    for b, a in zip(cells, rng.random(pool_size)):
+        b.affinity = a
+    return None, lambda: boltzmann_selection(cells, temperature=params["temperature"], max_survivors=pool_size // 10, rng=rng)
+
+def bench_boltzmann_indices(pool_size, n_serotypes, receptor_length, params, rng):
+    affinities = rng.random(pool_size)
+    return None, lambda: boltzmann_indices(affinities, temperature=params["temperature"], max_survivors=pool_size // 10, rng=rng)
+
+def bench_mutate_bcell(pool_size, n_serotypes, receptor_length, params, rng):
+    cells = make_bcells(pool_size, receptor_length, rng)
+
+    def run():
+        for b in cells:
+            mutate_bcell(b, mutation_rate=params["mutation_rate"], mutation_strength=params["mutation_strength"], rng=rng)
+    return None, run
+
+def bench_mutate_receptors(pool_size, n_serotypes, receptor_length, params, rng):
+    receptors = rng.random((pool_size, receptor_length))
+    mask = np.ones(pool_size, dtype=bool)
+    return None, lambda: mutate_receptors(receptors, mask, mutation_rate=params["mutation_rate"], mutation_strength=params["mutation_strength"], rng=rng)
+
+def bench_compute_affinity(pool_size, n_serotypes, receptor_length, params, rng):
+    epitope = rng.random(receptor_length).tolist()
+    receptors = rng.random((pool_size, receptor_length)).tolist()
+
+    def run():
+        for r in receptors:
+            compute_affinity(epitope, r)
+    return None, run
+
+def bench_compute_affinity_batch(pool_size, n_serotypes, receptor_length, params, rng):
+    epitopes = rng.random((n_serotypes, receptor_length))
+    receptors = rng.random((pool_size, receptor_length))
+    return None, lambda: compute_affinity_batch(receptors, epitopes)
+
+def bench_la(pool_size, n_serotypes, receptor_length, params, rng):
+    # `la` usa siempre los 7 antígenos de main.build_antigens (receptores de largo 5)
+    from main import la
+    la_params = dict(params, naive_pool_size=pool_size)
+    return None, lambda: la(la_params, rng=rng)
+
+# Casos: (nombre, función, ejes de la rejilla que lo afectan)
+BENCHMARKS = [
+    ("fillCGs", bench_fill_cgs, ("pool_size", "n_serotypes", "receptor_length")),
+    ("GerminalCenter.run_cycle", bench_run_cycle, ("pool_size", "receptor_length")),
+    ("GerminalCenter.run_cycle[numba]", bench_run_cycle_numba, ("pool_size", "receptor_length")),
+    ("ImmuneSystem.step", bench_step, ("pool_size", "n_serotypes")),
+    ("ImmuneSystem.step[gc_workers=4]", bench_step_threads, ("pool_size", "n_serotypes")),
+    ("boltzmann_selection", bench_boltzmann_selection, ("pool_size",)),
+    ("boltzmann_indices", bench_boltzmann_indices, ("pool_size",)),
+    ("mutate_bcell", bench_mutate_bcell, ("pool_size", "receptor_length")),
+    ("mutate_receptors", bench_mutate_receptors, ("pool_size", "receptor_length")),
+    ("compute_affinity", bench_compute_affinity, ("pool_size", "receptor_length")),
+    ("compute_affinity_batch", bench_compute_affinity_batch, ("pool_size", "n_serotypes", "receptor_length")),
+    ("la", bench_la, ("pool_size",)),
+]
+
+# Casos cuya primera llamada compila (JIT): se corren una vez sin medir antes de los tiempos
+WARMUP = {"GerminalCenter.run_cycle[numba]"}
+
+def run_benchmarks(grid=GRID, params=SIMULATION_PARAMS, repeat=5, only=None, seed=0):
+    results = []
+    for name, bench, axes in BENCHMARKS:
+        if only is not None and name not in only:
+            continue
+        # Solo se recorren los ejes relevantes; los demás toman su primer valor
+        defaults = {k: v[0] for k, v in grid.items()}
+        for values in itertools.product(*(grid[a] for a in axes)):
+            case = dict(defaults, **dict(zip(axes, values)))
+            rng = np.random.default_rng(seed)
+            setup, fn = bench(case["pool_size"], case["n_serotypes"], case["receptor_length"], params, rng)
+            if name in WARMUP:
+                timeit(fn, setup, repeat=1)
+            times = timeit(fn, setup, repeat=1 if name == "la" else repeat)
+            results.append({
+                "name": name,
+                "case": case,
+                "times": times,
+                "min": min(times),
+                "median": float(np.median(times)),
+            })
+            print(f"{name:28s} {json.dumps(case):70s} {min(times):10.4f} s")
+    return results
+
+def metadata(params=SIMULATION_PARAMS):
+    """Commit (del repositorio de este archivo, no del directorio actual), versiones y `params` usados."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "numba": importlib.util.find_spec("numba") is not None,
+        "machine": platform.machine(),
+        "params": {k: (float(v) if isinstance(v, np.floating) else v) for k, v in params.items()},
+    }
+
+def compare(results, baseline):
+    """Imprime la razón nuevo/anterior del tiempo mínimo para los casos comunes."""
+    previous = {(r["name"], json.dumps(r["case"], sort_keys=True)): r["min"] for r in baseline["results"]}
+    for r in results:
+        key = (r["name"], json.dumps(r["case"], sort_keys=True))
+        if key in previous:
+            print(f"{r['name']:28s} {key[1]:70s} x{r['min'] / previous[key]:.2f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default="bench.json", help="archivo JSON de resultados")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="rejilla reducida")
+    parser.add_argument("--only", nargs="*", help="nombres de los casos a correr")
+    parser.add_argument("--compare", help="JSON de una corrida anterior")
+    args = parser.parse_args(argv)
+
+    params = SIMULATION_PARAMS
+    results = run_benchmarks(QUICK_GRID if args.quick else GRID, params=params, repeat=args.repeat, only=args.only)
+    with open(args.output, "w") as f:
+        json.dump({"meta": metadata(params), "results": results}, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+if __name__ == "__main__":
+    main()
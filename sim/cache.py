@@ -0,0 +1,120 @@
+# cache.py
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import time
+from functools import lru_cache
+import numpy as np
+
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+@lru_cache(maxsize=None)
+def code_version(root=SOURCE_DIR):
+    """Hash de todos los .py bajo `root`: cambia con cualquier cambio de código del simulador."""
+    digest = hashlib.sha256()
+    for dirpath, dirnames, filenames in sorted(os.walk(root)):
+        dirnames[:] = sorted(d for d in dirnames if d != "__pycache__")
+        for name in sorted(filenames):
+            if name.endswith(".py"):
+                path = os.path.join(dirpath, name)
+                digest.update(os.path.relpath(path, root).encode())
+                with open(path, "rb") as f:
+                    digest.update(f.read())
+    return digest.hexdigest()
+
+def _canonical(value):
+    # Tipos de NumPy y tuplas a su equivalente JSON, para que el hash no dependa de ellos
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def seed_key(seed):
+    """Representación estable de una semilla (int, None o SeedSequence)."""
+    if isinstance(seed, np.random.SeedSequence):
+        return f"{seed.entropy}:{list(seed.spawn_key)}"
+    return str(seed)
+
+def run_key(params, seed, kind="la", **extra):
+    """Hash canónico de (parámetros, versión del código, semilla, tipo de corrida y extras)."""
+    payload = {
+        "params": _canonical(params),
+        "code": code_version(),
+        "seed": seed_key(seed),
+        "kind": kind,
+        "extra": _canonical(extra),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+class RunCache:
+    """
+    Resultados de simulación guardados en SQLite, por `run_key`.
+
+    Cada proceso abre su propia conexión la primera vez que la usa (la conexión no se
+    copia al pasar el cache a un pool de procesos) y la base usa WAL, así que varios
+    procesos pueden escribir a la vez. Una semilla None nunca se repite, así que esas
+    corridas se guardan pero no vuelven a encontrarse.
+
+    Uso:
+        cache = RunCache("corridas.sqlite")
+        run_ensemble(params, 48, seed=0, cache=cache)  # la segunda vez no simula
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._connection = None
+
+    def __getstate__(self):
+        return {"path": self.path, "_connection": None}
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, timeout=60)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS runs ("
+                "key TEXT PRIMARY KEY, kind TEXT, seed TEXT, code TEXT, params TEXT, created REAL, result BLOB)"
+            )
+            self._connection.commit()
+        return self._connection
+
+    def get(self, params, seed, kind="la", **extra):
+        """Resultado guardado, o None si esa corrida no está en el cache."""
+        row = self.connection.execute("SELECT result FROM runs WHERE key = ?", (run_key(params, seed, kind, **extra),)).fetchone()
+        return None if row is None else pickle.loads(row[0])
+
+    def put(self, params, seed, result, kind="la", **extra):
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (run_key(params, seed, kind, **extra), kind, seed_key(seed), code_version(),
+                 json.dumps(_canonical(params), sort_keys=True), time.time(), pickle.dumps(result)),
+            )
+
+    def cached(self, fn, params, seed, kind="la", **extra):
+        """fn() si la corrida no está guardada (y la guarda); si no, el resultado guardado."""
+        result = self.get(params, seed, kind, **extra)
+        if result is None:
+            result = fn()
+            self.put(params, seed, result, kind, **extra)
+        return result
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+def as_cache(cache):
+    """Acepta un RunCache, una ruta o None."""
+    if cache is None or isinstance(cache, RunCache):
+        return cache
+    return RunCache(cache)
@@ -0,0 +1,153 @@
+# calibration.py
+import math
+import os
+import pickle
+from typing import Dict, Tuple
+import numpy as np
+from ensemble import run_ensemble_batch
+
+class ParameterSpace:
+    """
+    Espacio de parámetros a calibrar.
+
+    Args:
+        bounds: {nombre: (mínimo, máximo, paso máximo)}. Un vecino cambia un único
+            parámetro, elegido al azar, en un delta uniforme de [-paso, paso] y lo
+            recorta al rango.
+    """
+
+    def __init__(self, bounds: Dict[str, Tuple[float, float, float]]):
+        self.bounds = bounds
+
+    @property
+    def names(self):
+        return list(self.bounds)
+
+    def neighbor(self, params: dict, rng: np.random.Generator) -> dict:
+        nuevo = params.copy()
+        clave = self.names[rng.integers(len(self.bounds))]
+        low, high, step = self.bounds[clave]
+        nuevo[clave] = float(min(high, max(low, nuevo[clave] + rng.uniform(-step, step))))
+        return nuevo
+
+    def vector(self, params: dict) -> np.ndarray:
+        """Valores de los parámetros calibrados, en el orden de `names`."""
+        return np.array([params[k] for k in self.names], dtype=float)
+
+    def to_unit(self, params: dict) -> np.ndarray:
+        """
+        `vector(params)` reescalado al cubo unitario según los rangos. Un parámetro
+        con rango vacío (low == high) queda en 0.
+        """
+        low, high = self._limits()
+        width = high - low
+        return np.divide(self.vector(params) - low, width, out=np.zeros_like(width), where=width > 0)
+
+    def from_unit(self, u, base: dict) -> dict:
+        """Copia de `base` con los parámetros calibrados tomados del punto `u` del cubo unitario."""
+        low, high = self._limits()
+        values = low + np.clip(u, 0.0, 1.0) * (high - low)
+        return dict(base, **{k: float(v) for k, v in zip(self.names, values)})
+
+    def _limits(self):
+        low = np.array([self.bounds[k][0] for k in self.names], dtype=float)
+        high = np.array([self.bounds[k][1] for k in self.names], dtype=float)
+        return low, high
+
+# Mismo espacio que el `vecino` original del recocido
+DEFAULT_SPACE = ParameterSpace({
+    "plasma_production_factor": (0.0, 0.1, 0.005),
+    "memory_production_factor": (0.0, 0.1, 0.005),
+})
+
+def save_checkpoint(path, state):
+    """Escritura atómica: un corte a mitad de escritura no corrompe el checkpoint anterior."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(state, f)
+    os.replace(tmp, path)
+
+def load_checkpoint(path):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+def anneal(param_inicial, objective, space=DEFAULT_SPACE, replicates=48, candidates=1,
+           temp_inicial=1.0, temp_final=1e-1, alpha=0.9, max_iter=100,
+           workers=None, seed=None, checkpoint=None, verbose=True, cohort=False, cache=None):
+    """
+    Recocido simulado con evaluación concurrente de vecinos y checkpoints.
+
+    En cada etapa se proponen `candidates` vecinos del estado actual y se simulan todos
+    juntos (`replicates` réplicas cada uno, en un solo pool de procesos); el mejor de
+    ellos pasa por el criterio de Metropolis. Con candidates=1 es el recocido original.
+
+    Args:
+        param_inicial (dict): parámetros iniciales.
+        objective: función que recibe el arreglo de `run_ensemble` y devuelve la energía
+            (menor es mejor), p. ej. `simulated_annealing.metrica`.
+        space (ParameterSpace): parámetros a calibrar y sus rangos.
+        checkpoint (str): ruta del checkpoint. Si existe, se reanuda desde él; después de
+            cada etapa se reescribe con el estado actual, el mejor y el estado del RNG.
+        cohort (bool): simular las réplicas de cada candidato como una cohorte virtual
+            (ver ensemble.run_cohort).
+        cache (RunCache o ruta): cache de corridas (ver ensemble.run_ensemble). Las
+            semillas de cada etapa salen del RNG, así que al repetir una calibración con
+            la misma semilla, o al reanudarla tras un corte, las etapas ya simuladas se
+            leen del cache.
+
+    Returns:
+        (mejor_estado, mejor_energia, res): mejores parámetros, su energía y sus réplicas.
+    """
+    if checkpoint is not None and os.path.exists(checkpoint):
+        state = load_checkpoint(checkpoint)
+        rng = np.random.default_rng()
+        rng.bit_generator.state = state["rng_state"]
+    else:
+        rng = np.random.default_rng(seed)
+        res = run_ensemble_batch([param_inicial], replicates, workers=workers, seeds=[_stage_seed(rng)], cohort=cohort, cache=cache)[0]
+        energia = objective(res)
+        state = {
+            "iteration": 0,
+            "temperature": temp_inicial,
+            "current": param_inicial,
+            "current_energy": energia,
+            "best": param_inicial,
+            "best_energy": energia,
+            "best_result": res,
+            "history": [(param_inicial, energia)],
+        }
+        if checkpoint is not None:
+            state["rng_state"] = rng.bit_generator.state
+            save_checkpoint(checkpoint, state)
+
+    while state["temperature"] > temp_final and state["iteration"] < max_iter:
+        if verbose:
+            print(f"etapa {state['iteration']} del recocido")
+            print(f"Temperatura {state['temperature']}")
+        state["iteration"] += 1
+        nuevos = [space.neighbor(state["current"], rng) for _ in range(candidates)]
+        resultados = run_ensemble_batch(nuevos, replicates, workers=workers, seeds=[_stage_seed(rng) for _ in nuevos], cohort=cohort, cache=cache)
+        energias = [objective(r) for r in resultados]
+        state["history"].extend(zip(nuevos, energias))
+
+        k = int(np.argmin(energias))
+        delta = energias[k] - state["current_energy"]
+        if delta < 0 or rng.random() < math.exp(-delta / state["temperature"]):
+            state["current"] = nuevos[k]
+            state["current_energy"] = energias[k]
+            if energias[k] < state["best_energy"]:
+                state["best"] = nuevos[k]
+                state["best_energy"] = energias[k]
+                state["best_result"] = resultados[k]
+        state["temperature"] *= alpha  # enfriamiento
+
+        if checkpoint is not None:
+            state["rng_state"] = rng.bit_generator.state
+            save_checkpoint(checkpoint, state)
+
+    return state["best"], state["best_energy"], state["best_result"]
+
+def _stage_seed(rng):
+    # Semilla de las réplicas de un candidato, derivada del RNG del recocido para que
+    # una corrida reanudada repita exactamente las mismas simulaciones
+    return int(rng.integers(2**63))
@@ -15,5 +15,18 @@ SIMULATION_PARAMS = {
     "mutation_rate":0.7,
     "mutation_strength":0.5,
     "temperature":0.1,
-    "THRESHOLD" : 0.3
+    "THRESHOLD" : 0.3,
+    "gc_backend": "numpy",  # "numpy" (arreglos), "numba" (ciclo compilado; NumPy si no hay Numba) u "objects" (lista de BCell)
+    "naive_pool_size": 10000,  # células naive generadas en cada vacunación
+    "matching": "matrix",  # "matrix" (asignación en bloque) o "simpy"
+    "matching_steps": 200,  # intentos por antígeno al llenar los CG
+    # Hilos para avanzar los CG de un mismo día (1 = secuencial). Con los tamaños de CG
+    # de la simulación cada etapa es una llamada corta de NumPy que retiene el GIL:
+    # medido con `la` y con benchmarks.py ("ImmuneSystem.step" contra
+    # "ImmuneSystem.step[gc_workers=4]"), 4 hilos no ganan ni con naive_pool_size=100000
+    # ni con gc_backend "numba". Dejar en 1 salvo para medir otras configuraciones
+    "gc_workers": 1,
+    "pool_mode": "counts",  # "counts" (conteos por serotipo) o "cells" (cada BCell, para linajes)
+    "fast_forward": True,  # saltar los días sin actividad de CG hasta el próximo evento
+    "pool_affinity_bins": None,  # bordes de afinidad para los conteos, p. ej. [0.6, 0.8]
 }
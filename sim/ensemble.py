@@ -0,0 +1,166 @@
+# ensemble.py
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+from main import la, la_cohort, sample_days, SEROTYPES
+from recorder import TrajectoryRecorder
+from cache import as_cache
+
+def replicate_seeds(seed, times):
+    """Una SeedSequence hija por réplica: la réplica i siempre recibe la misma semilla."""
+    return np.random.SeedSequence(seed).spawn(times)
+
+def run_replicate(params, seed_seq, cache=None):
+    """
+    Corre una réplica de `la(params)` con semilla propia.
+
+    Args:
+        cache (RunCache): si se indica, la réplica se lee de ahí cuando ya fue simulada
+            y se guarda en caso contrario.
+
+    Returns:
+        np.ndarray: niveles de anticuerpos, forma (serotipos, días de muestreo).
+    """
+    def simulate():
+        levels = la(params, rng=np.random.default_rng(seed_seq))
+        return np.array([levels[s] for s in SEROTYPES], dtype=float)
+    return simulate() if cache is None else cache.cached(simulate, params, seed_seq, "la")
+
+def run_cohort(params, seed_seq, times, cache=None):
+    """Las `times` réplicas como una sola cohorte virtual (ver main.la_cohort): (réplica, serotipo, día)."""
+    def simulate():
+        return la_cohort(params, times, rng=np.random.default_rng(seed_seq))
+    return simulate() if cache is None else cache.cached(simulate, params, seed_seq, "cohort", times=times)
+
+def record_replicate(params, seed_seq, days, observables, cache=None):
+    """Como `run_replicate` pero registra `observables` en `days` ({observable: (serotipo, día)})."""
+    def simulate():
+        recorder = TrajectoryRecorder(SEROTYPES, days, observables)
+        la(params, recorder, rng=np.random.default_rng(seed_seq))
+        return recorder.replicate(0)
+    if cache is None:
+        return simulate()
+    return cache.cached(simulate, params, seed_seq, "record", days=list(days), observables=list(observables))
+
+def run_ensemble(params, times, workers=None, seed=None, cancel=None, cohort=False, cache=None):
+    """
+    Corre `times` réplicas de `la(params)` en un pool de procesos.
+
+    Args:
+        params (dict): parámetros de simulación (como SIMULATION_PARAMS).
+        times (int): número de réplicas.
+        workers (int): procesos del pool; por defecto os.cpu_count(). Con 1 se corre
+            en el proceso actual, sin pool.
+        seed (int): semilla raíz; cada réplica usa su propia SeedSequence hija, así que
+            el resultado no depende del número de procesos ni del orden de llegada.
+        cancel: objeto con `is_set()` (p. ej. threading.Event); si se activa, las
+            réplicas pendientes se cancelan.
+        cohort (bool): simular las réplicas como una cohorte virtual en un solo
+            CohortImmuneSystem (ver `run_cohort`) en lugar de una `la` por réplica.
+        cache (RunCache o ruta): resultados guardados por (parámetros, código, semilla);
+            las réplicas ya simuladas no se vuelven a correr.
+
+    Returns:
+        np.ndarray: forma (réplica, serotipo, día de muestreo), con serotipos en el
+        orden de `main.SEROTYPES`. Las réplicas canceladas quedan en NaN.
+    """
+    return run_ensemble_batch([params], times, workers=workers, seeds=[seed], cancel=cancel, cohort=cohort, cache=cache)[0]
+
+def run_ensemble_batch(params_list, times, workers=None, seeds=None, cancel=None, cohort=False, cache=None):
+    """
+    Como `run_ensemble` para varios juegos de parámetros a la vez, compartiendo un solo
+    pool: las réplicas de todos los juegos se reparten entre los procesos.
+
+    Args:
+        params_list (list): juegos de parámetros.
+        times (int): réplicas por juego.
+        seeds (list): semilla raíz de cada juego (None = entropía fresca).
+        cohort (bool): cada juego es una sola tarea que simula sus réplicas como una
+            cohorte virtual; el pool reparte juegos en lugar de réplicas.
+
+    Returns:
+        np.ndarray: forma (juego, réplica, serotipo, día de muestreo).
+    """
+    cache = as_cache(cache)
+    if seeds is None:
+        seeds = [None] * len(params_list)
+    results = np.full((len(params_list), times, len(SEROTYPES), len(sample_days(params_list[0]))), np.nan)
+
+    def store(key, levels):
+        results[key] = levels
+    if cohort:
+        tasks = {p: (params, np.random.SeedSequence(seed), times, cache) for p, (params, seed) in enumerate(zip(params_list, seeds))}
+        tasks = _cache_hits(cache, tasks, store, "cohort", times=times)
+        run_tasks(run_cohort, tasks, store, workers=workers, cancel=cancel)
+        return results
+
+    tasks = [
+        (p, r, params, seed_seq)
+        for p, (params, seed) in enumerate(zip(params_list, seeds))
+        for r, seed_seq in enumerate(replicate_seeds(seed, times))
+    ]
+    tasks = _cache_hits(cache, {(p, r): (params, seed_seq, cache) for p, r, params, seed_seq in tasks}, store, "la")
+    run_tasks(run_replicate, tasks, store, workers=workers, cancel=cancel)
+    return results
+
+def record_ensemble(params, times, days, observables=("antibody",), path=None, workers=None, seed=None, cancel=None, cache=None):
+    """
+    Corre `times` réplicas registrando varios observables en `days`.
+
+    Los resultados se copian a un TrajectoryRecorder a medida que llegan; con `path` el
+    recorder escribe a disco, así que la memoria no crece con el número de réplicas.
+
+    Returns:
+        TrajectoryRecorder: datos de forma (réplica, serotipo, día) por observable.
+    """
+    recorder = TrajectoryRecorder(SEROTYPES, days, observables, replicates=times, path=path)
+    cache = as_cache(cache)
+    tasks = {r: (params, seed_seq, recorder.days, recorder.observables, cache) for r, seed_seq in enumerate(replicate_seeds(seed, times))}
+    tasks = _cache_hits(cache, tasks, recorder.store, "record", days=recorder.days, observables=recorder.observables)
+    run_tasks(record_replicate, tasks, recorder.store, workers=workers, cancel=cancel)
+    recorder.flush()
+    return recorder
+
+def run_tasks(fn, tasks, on_result, workers=None, cancel=None):
+    """
+    Ejecuta fn(*args) para cada {clave: args} de `tasks` y entrega on_result(clave, resultado).
+
+    Con workers=1 corre en el proceso actual; si no, en un pool de procesos. Si `cancel`
+    se activa, las tareas pendientes se cancelan.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1:
+        for key, args in tasks.items():
+            if cancel is not None and cancel.is_set():
+                break
+            on_result(key, fn(*args))
+        return
+
+    pool = ProcessPoolExecutor(max_workers=workers)
+    futures = {pool.submit(fn, *args): key for key, args in tasks.items()}
+    pending = set(futures)
+    try:
+        while pending:
+            done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in done:
+                on_result(futures[future], future.result())
+            if cancel is not None and cancel.is_set():
+                break
+    finally:
+        # Si se canceló (o hubo un error) no se esperan las réplicas pendientes
+        pool.shutdown(wait=not pending, cancel_futures=True)
+
+def _cache_hits(cache, tasks, on_result, kind, **extra):
+    # Entrega en el proceso actual las tareas ya guardadas y devuelve las que faltan,
+    # para no levantar el pool cuando todo está en el cache
+    if cache is None:
+        return tasks
+    missing = {}
+    for key, args in tasks.items():
+        result = cache.get(args[0], args[1], kind, **extra)
+        if result is None:
+            missing[key] = args
+        else:
+            on_result(key, result)
+    return missing
@@ -0,0 +1,110 @@
+# environment/cohort.py
+from typing import Dict, List
+import numpy as np
+from agents.antigen import Antigen
+from agents.population import BCellPopulation
+from environment.germinal_center import GerminalCenter
+from environment.immune_system import ImmuneSystem
+from environment.pools import make_pool
+from processes.matching import match_bcells
+from processes.selection import boltzmann_group_indices
+from config import SIMULATION_PARAMS
+from profiling import NULL_PROFILER
+from utils import spawn_rngs
+
+class CohortGerminalCenter(GerminalCenter):
+    """
+    Centro germinal de un antígeno para todos los individuos de una cohorte virtual.
+
+    Las células de todos los individuos comparten una sola BCellPopulation (columna
+    `individual`), así que muerte, mutación y recálculo de afinidad son una pasada para
+    toda la cohorte. La selección y la salida son por individuo: cada uno conserva
+    cycles**2/1000 de sus propias células, y un individuo sin células vuelve a entregar
+    sus últimas células de memoria y plasmáticas, igual que un GerminalCenter vacío.
+    """
+    def __init__(self, id: int, antigen: Antigen, n_individuals: int, params = SIMULATION_PARAMS, profiler = NULL_PROFILER, rng = None):
+        super().__init__(id, antigen, params, profiler, rng)
+        self.backend = "numpy"
+        self.n_individuals = n_individuals
+        self.memory_cells = BCellPopulation.empty(len(antigen.epitope_vector))
+        self.plasma_cells = BCellPopulation.empty(len(antigen.epitope_vector))
+
+    def seed_naive_cells(self, naive_pool: BCellPopulation):
+        self.population = naive_pool
+
+    def sizes(self) -> np.ndarray:
+        """Células en el centro germinal de cada individuo, (n_individuals,)."""
+        return np.bincount(self.population.individual, minlength=self.n_individuals)
+
+    def mean_affinity(self) -> np.ndarray:
+        """Afinidad media de cada individuo, (n_individuals,); NaN si no tiene células."""
+        sizes = self.sizes()
+        totals = np.bincount(self.population.individual, weights=self.population.affinity, minlength=self.n_individuals)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(sizes > 0, totals / sizes, np.nan)
+
+    def _select(self, pop: BCellPopulation) -> np.ndarray:
+        max_survivors = (self.cycles**2 / 1000 * self.sizes()).astype(int)
+        return boltzmann_group_indices(pop.affinity, pop.individual, max_survivors, temperature= self.params["temperature"], rng=self.rng)
+
+    def _emitted(self, fresh: BCellPopulation, previous: BCellPopulation, pop: BCellPopulation) -> BCellPopulation:
+        empty = self.sizes() == 0
+        return fresh.concat(previous.take(empty[previous.individual]))
+
+class CohortImmuneSystem(ImmuneSystem):
+    """
+    ImmuneSystem para una cohorte virtual de `n_individuals` individuos en una sola
+    instancia.
+
+    Cada individuo tiene su reserva naive, sus células en cada centro germinal y sus
+    pools, pero todo se guarda en arreglos compartidos con un eje de individuos:
+    `antibody_levels[serotipo]` y `memory_pool.count(serotipo)` son arreglos
+    (n_individuals,). Los pools son siempre conteos (ver CountPool) y la asignación de
+    células naive es siempre en bloque (match_bcells), una vez por individuo.
+
+    Args:
+        baseline: niveles de anticuerpos previos a la vacunación, {serotipo: escalar o
+            arreglo (n_individuals,)}; por defecto cero para todos.
+    """
+    def __init__(self, antigens: List[Antigen], n_individuals: int, params = SIMULATION_PARAMS, profiler = NULL_PROFILER, rng = None, baseline: Dict[str, np.ndarray] = None):
+        super().__init__(antigens, [], params, profiler, rng)
+        self.n_individuals = n_individuals
+        serotypes = [ag.serotype for ag in antigens]
+        self.memory_pool = make_pool(serotypes, params, individuals=n_individuals)
+        self.plasma_pool = make_pool(serotypes, params, individuals=n_individuals)
+        baseline = {} if baseline is None else baseline
+        self.antibody_levels = {
+            s: np.broadcast_to(np.asarray(baseline.get(s, 0.0), dtype=np.float64), (n_individuals,)).copy()
+            for s in serotypes
+        }
+
+    def fillCGs(self, antigens: List[Antigen]):
+        gc_rngs = spawn_rngs(self.rng, len(antigens))
+        self.gcs = [CohortGerminalCenter(id=ag.id, antigen=ag, n_individuals=self.n_individuals, params=self.params, profiler=self.profiler, rng=gc_rng) for ag, gc_rng in zip(antigens, gc_rngs)]
+        epitopes = np.array([ag.epitope_vector for ag in antigens], dtype=np.float64)
+        # Columnas de la población de cada antígeno, acumuladas individuo por individuo
+        parts = [{"receptors": [], "affinity": [], "ids": [], "individual": []} for _ in antigens]
+        with self.profiler.phase("matching", size=self.bcells_pool.shape[0] * self.bcells_pool.shape[1]):
+            for i, receptors in enumerate(self.bcells_pool):
+                assigned, affinity = match_bcells(receptors, epitopes, self.params["THRESHOLD"], attempts=self.params["matching_steps"], rng=self.rng)
+                for a, index in enumerate(assigned):
+                    parts[a]["receptors"].append(receptors[index])
+                    parts[a]["affinity"].append(affinity[a, index])
+                    parts[a]["ids"].append(index)
+                    parts[a]["individual"].append(np.full(len(index), i))
+
+        for gc, ag, part in zip(self.gcs, antigens, parts):
+            n = sum(len(ids) for ids in part["ids"])
+            gc.seed_naive_cells(BCellPopulation(
+                np.concatenate(part["receptors"]) if n else np.empty((0, epitopes.shape[1])),
+                np.concatenate(part["affinity"]) if n else None,
+                np.full(n, ag.serotype, dtype=object),
+                np.concatenate(part["ids"]) if n else None,
+                np.concatenate(part["individual"]) if n else None,
+            ))
+
+    def vaccinate(self, antigens: List[Antigen]):
+        self.profiler.day = self.day
+        # Reserva naive de cada individuo: (n_individuals, naive_pool_size, largo del receptor)
+        self.bcells_pool = self.rng.random((self.n_individuals, self.params["naive_pool_size"], len(antigens[0].epitope_vector)))
+        self.fillCGs(antigens)
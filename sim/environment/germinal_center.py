@@ -1,16 +1,19 @@
 # environment/germinal_center.py
 from agents.BCell import BCell
 from agents.antigen import Antigen
+from agents.population import BCellPopulation
 from typing import List
-from processes.selection import boltzmann_selection
-from processes.affinity import compute_affinity
-from processes.differentiation import differentiate_bcell
-from processes.mutation import mutate_bcell
-import random
+from processes.selection import boltzmann_indices
+from processes.affinity import compute_affinity_batch
+from processes.differentiation import differentiation_masks
+from processes.mutation import mutate_bcell, mutate_receptors
+import numpy as np
 from config import SIMULATION_PARAMS
+from profiling import NULL_PROFILER
+from utils import ensure_rng
 
 class GerminalCenter:
-    def __init__(self, id: int, antigen: Antigen, params = SIMULATION_PARAMS):
+    def __init__(self, id: int, antigen: Antigen, params = SIMULATION_PARAMS, profiler = NULL_PROFILER, rng = None):
         self.id = id
         self.antigen = antigen
         self.bcells: List[BCell] = []
@@ -19,46 +22,177 @@ class GerminalCenter:
         self.factors: float = 1.0  # Recursos limitantes
         self.cycles : int = 0
         self.params = params
+        # "objects": lista de BCell; "numpy": BCellPopulation (estructura de arreglos);
+        # "numba": BCellPopulation con el ciclo compilado (NumPy si Numba no está instalado)
+        self.backend = params["gc_backend"]
+        if self.backend == "numba":
+            # Numba se carga solo con este backend: importarlo cuesta ~0.4 s por proceso
+            from processes.kernels import NUMBA_AVAILABLE
+            if not NUMBA_AVAILABLE:
+                self.backend = "numpy"
+        self.population = BCellPopulation.empty(len(antigen.epitope_vector))
+        self.profiler = profiler
+        self.rng = ensure_rng(rng)  # Generator propio del CG (ImmuneSystem le da uno hijo del suyo)
 
     def seed_naive_cells(self, naive_pool: List[BCell]):
-        self.bcells = naive_pool
+        if self.backend != "objects":
+            self.population = BCellPopulation.from_bcells(naive_pool, len(self.antigen.epitope_vector))
+        else:
+            self.bcells = naive_pool
+
+    def __len__(self):
+        if self.backend != "objects":
+            return len(self.population)
+        return len(self.bcells)
+
+    def is_quiescent(self) -> bool:
+        """
+        Vacío y sin salidas pendientes: un CG vacío sigue devolviendo en cada ciclo sus
+        últimas células de memoria y plasmáticas, así que solo es inerte si también
+        esas están vacías.
+        """
+        return len(self) == 0 and len(self.memory_cells) == 0 and len(self.plasma_cells) == 0
+
+    def affinities(self) -> np.ndarray:
+        """Afinidades de las células que están en el centro germinal."""
+        if self.backend != "objects":
+            return self.population.affinity
+        return np.array([cell.affinity for cell in self.bcells], dtype=np.float64)
+
+    def sizes(self):
+        """Células en el centro germinal (un arreglo por individuo en CohortGerminalCenter)."""
+        return len(self)
+
+    def mean_affinity(self):
+        """Afinidad media de las células del centro germinal; NaN si está vacío."""
+        affinities = self.affinities()
+        return affinities.mean() if len(affinities) > 0 else np.nan
 
     def run_cycle(self):
         self.cycles += 1
+        if self.backend == "numpy":
+            return self._run_cycle_numpy()
+        if self.backend == "numba":
+            return self._run_cycle_numba()
+        return self._run_cycle_objects()
+
+    def _run_cycle_numpy(self):
+        """
+        Mismo ciclo que `_run_cycle_objects`, con cada etapa como una pasada vectorizada.
+        Las células de memoria y plasmáticas se devuelven como BCellPopulation.
+        """
+        pop = self.population
+        prof = self.profiler
+        serotype = self.antigen.serotype
+        if len(pop) > 0:
+            with prof.phase("selection", serotype, len(pop)):
+                selected = self._select(pop)
+            with prof.phase("differentiation", serotype, len(selected)):
+                memory_mask, plasma_mask = differentiation_masks(pop.affinity[selected], affinity_threshold_memory= self.params["affinity_threshold_memory"], affinity_threshold_plasma=self.params["affinity_threshold_plasma"])
+                self.memory_cells = self._emitted(pop.take(selected[memory_mask]), self.memory_cells, pop)
+                self.plasma_cells = self._emitted(pop.take(selected[plasma_mask]), self.plasma_cells, pop)
+
+            # Las diferenciadas salen del centro germinal; el resto sufre la muerte diaria
+            with prof.phase("death", serotype, len(pop)):
+                keep = self.rng.random(len(pop)) > self.params["lf_decay"]
+                keep[selected[memory_mask | plasma_mask]] = False
+                pop = pop.take(keep)
+
+            # Hipermutación: cada sobreviviente genera un mutante con probabilidad mutation_p
+            with prof.phase("mutation", serotype, len(pop)):
+                new_receptors, parent_indices = mutate_receptors(pop.receptors, self.rng.random(len(pop)) < self.params["mutation_p"], mutation_rate=self.params["mutation_rate"], mutation_strength=self.params["mutation_strength"], rng=self.rng)
+            with prof.phase("rescoring", serotype, len(new_receptors)):
+                mutants = BCellPopulation(
+                    new_receptors,
+                    compute_affinity_batch(new_receptors, self.antigen.epitope_vector),
+                    pop.serotype[parent_indices],
+                    pop.ids[parent_indices],
+                    pop.individual[parent_indices],
+                )
+
+            self.population = pop.concat(mutants)
+
+        return (self.memory_cells, self.plasma_cells)
+
+    def _run_cycle_numba(self):
+        """
+        Mismo ciclo que `_run_cycle_numpy` con los kernels de processes.kernels; el RNG
+        se consume en el mismo orden, así que da la misma población.
+        """
+        from processes.kernels import select_differentiate_kernel, mutate_rescore_kernel
+        pop = self.population
+        serotype = self.antigen.serotype
+        n = len(pop)
+        if n > 0:
+            with self.profiler.phase("cycle_kernel", serotype, n):
+                max_survivors = int(self.cycles**2 / 1000 * n)
+                # Como boltzmann_indices: sin ruido si se seleccionan todas o ninguna
+                gumbel = self.rng.gumbel(size=n) if 0 < max_survivors < n else np.zeros(n)
+                death_u = self.rng.random(n)
+                memory_idx, plasma_idx, keep_idx = select_differentiate_kernel(
+                    pop.affinity, gumbel, death_u, self.params["temperature"], max_survivors,
+                    self.params["affinity_threshold_memory"], self.params["affinity_threshold_plasma"], self.params["lf_decay"],
+                )
+                self.memory_cells = self._emitted(pop.take(memory_idx), self.memory_cells, pop)
+                self.plasma_cells = self._emitted(pop.take(plasma_idx), self.plasma_cells, pop)
+
+                mutate_u = self.rng.random(len(keep_idx))
+                n_mutants = int(np.count_nonzero(mutate_u < self.params["mutation_p"]))
+                shape = (n_mutants, pop.receptors.shape[1])
+                components_u = self.rng.random(shape)
+                noise = self.rng.normal(0, self.params["mutation_strength"], shape)
+                receptors, affinity, source = mutate_rescore_kernel(
+                    pop.receptors, pop.affinity, keep_idx, mutate_u, self.params["mutation_p"],
+                    components_u, self.params["mutation_rate"], noise, np.asarray(self.antigen.epitope_vector, dtype=np.float64),
+                )
+                self.population = BCellPopulation(receptors, affinity, pop.serotype[source], pop.ids[source], pop.individual[source])
+
+        return (self.memory_cells, self.plasma_cells)
+
+    def _select(self, pop: BCellPopulation) -> np.ndarray:
+        """Índices de las células que pasan la selección de Boltzmann del ciclo."""
+        return boltzmann_indices(pop.affinity, max_survivors= int(self.cycles**2 / 1000 * len(pop)), temperature= self.params["temperature"], rng=self.rng)
+
+    def _emitted(self, fresh: BCellPopulation, previous: BCellPopulation, pop: BCellPopulation) -> BCellPopulation:
+        """Salida del ciclo a partir de las células recién diferenciadas (ver CohortGerminalCenter)."""
+        return fresh
+
+    def _run_cycle_objects(self):
+        prof = self.profiler
+        serotype = self.antigen.serotype
         if len(self.bcells) > 0:
-            self.memory_cells = []
-            self.plasma_cells = []
-            selected = boltzmann_selection(self.bcells, max_survivors= int(self.cycles**2 / 1000 * len(self.bcells)), temperature= self.params["temperature"])
+            with prof.phase("selection", serotype, len(self.bcells)):
+                affinities = np.array([cell.affinity for cell in self.bcells])
+                selected = boltzmann_indices(affinities, max_survivors= int(self.cycles**2 / 1000 * len(self.bcells)), temperature= self.params["temperature"], rng=self.rng)
             # with open("log_simulacion.txt", "a") as f:
             #     f.write(f"selected {len(selected)}\n")
 
-            for cell in selected:
-                # with open("log_simulacion.txt", "a") as f:
-                #     f.write(f"afinidad {cell.affinity}\n")
-                tipo = differentiate_bcell(cell, affinity_threshold_memory= self.params["affinity_threshold_memory"], affinity_threshold_plasma=self.params["affinity_threshold_plasma"])  # debe devolver 'memoria', 'plasma' o None
-                if tipo == 'memory':
-                    self.memory_cells.append(cell)
-                    if cell in self.bcells:
-                        self.bcells.remove(cell)
-                    continue
-                if tipo == 'plasma':
-                    self.plasma_cells.append(cell)
-                    if cell in self.bcells:
-                        self.bcells.remove(cell)
-                    continue
-            
-
-            self.bcells = [cell for cell in self.bcells if random.random() > self.params["lf_decay"]]
-
-            
-
-            new = []
-            for cell in self.bcells:
-                if random.random() < self.params["mutation_p"]:
-                    m = mutate_bcell(cell, mutation_rate=self.params["mutation_rate"], mutation_strength=self.params["mutation_strength"])
-                    m.affinity = compute_affinity(self.antigen.epitope_vector, m.receptors)
-                    
-                    new.append(m)
+            # Partición por índices: la pertenencia se decide por posición, no por igualdad
+            # de dataclass (dos células con receptores iguales son células distintas)
+            with prof.phase("differentiation", serotype, len(selected)):
+                memory_mask, plasma_mask = differentiation_masks(affinities[selected], affinity_threshold_memory= self.params["affinity_threshold_memory"], affinity_threshold_plasma=self.params["affinity_threshold_plasma"])
+                self.memory_cells = [self.bcells[i] for i in selected[memory_mask]]
+                self.plasma_cells = [self.bcells[i] for i in selected[plasma_mask]]
+
+                differentiated = np.zeros(len(self.bcells), dtype=bool)
+                differentiated[selected[memory_mask | plasma_mask]] = True
+                self.bcells = [cell for cell, gone in zip(self.bcells, differentiated) if not gone]
+
+            with prof.phase("death", serotype, len(self.bcells)):
+                alive = self.rng.random(len(self.bcells)) > self.params["lf_decay"]
+                self.bcells = [cell for cell, keep in zip(self.bcells, alive) if keep]
+
+            with prof.phase("mutation", serotype, len(self.bcells)):
+                new = []
+                mutate = self.rng.random(len(self.bcells)) < self.params["mutation_p"]
+                for cell, m in zip(self.bcells, mutate):
+                    if m:
+                        new.append(mutate_bcell(cell, mutation_rate=self.params["mutation_rate"], mutation_strength=self.params["mutation_strength"], rng=self.rng))
+            with prof.phase("rescoring", serotype, len(new)):
+                if len(new) > 0:
+                    affinities = compute_affinity_batch(np.array([m.receptors for m in new]), self.antigen.epitope_vector)
+                    for m, affinity in zip(new, affinities):
+                        m.affinity = affinity
             self.bcells += new
             # with open("log_simulacion.txt", "a") as f:
             #     f.write(f"b desp mutar {len(self.bcells)}\n")
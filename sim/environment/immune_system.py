@@ -1,30 +1,67 @@
 # environment/immune_system.py
+import copy
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 from environment.germinal_center import GerminalCenter
+from environment.pools import make_pool
 from agents.antigen import Antigen
 from agents.BCell import BCell
-from processes.affinity import compute_affinity
+from processes.affinity import compute_affinity_batch
 from processes.mutation import mutate_bcell
+from processes.matching import match_bcells
 from config import SIMULATION_PARAMS
+from profiling import NULL_PROFILER
+from utils import ensure_rng, spawn_rngs
 import numpy as np
 import simpy
-import random
-import time
 
 class ImmuneSystem:
-    def __init__(self, antigens: List[Antigen], bcells_pool = List[BCell], params = SIMULATION_PARAMS):
+    def __init__(self, antigens: List[Antigen], bcells_pool = List[BCell], params = SIMULATION_PARAMS, profiler = NULL_PROFILER, rng = None):
         self.gcs = []
         self.bcells_pool = bcells_pool
         self.antigens = antigens
-        self.memory_pool = {ag.serotype: [] for ag in antigens}
-        self.plasma_pool = {ag.serotype: [] for ag in antigens}
-        self.antibody_levels = {ag.serotype: 0.0 for ag in antigens}
         self.params = params
+        # Pools por serotipo: conteos agregados ("counts") o cada BCell ("cells")
+        self.memory_pool = make_pool([ag.serotype for ag in antigens], params)
+        self.plasma_pool = make_pool([ag.serotype for ag in antigens], params)
+        self.antibody_levels = {ag.serotype: 0.0 for ag in antigens}
+        self.day = 0  # días simulados con step()
+        self.profiler = profiler  # ver profiling.Profiler
+        # Generator del individuo; cada CG recibe un hijo independiente (SeedSequence.spawn)
+        self.rng = ensure_rng(rng)
+        self._executor = None  # ThreadPoolExecutor de los CG, creado al primer step con gc_workers > 1
         
     def fillCGs(self, antigens: List[Antigen]):
         self.gcs = []
-        self.gcs = [GerminalCenter(id=ag.id, antigen=ag, params = self.params)for ag in antigens]
-        
+        gc_rngs = spawn_rngs(self.rng, len(antigens))
+        self.gcs = [GerminalCenter(id=ag.id, antigen=ag, params = self.params, profiler = self.profiler, rng = gc_rng)for ag, gc_rng in zip(antigens, gc_rngs)]
+        with self.profiler.phase("matching", size=len(self.bcells_pool)):
+            if self.params["matching"] == "matrix":
+                assigned_bcells = self._match_matrix(antigens)
+            else:
+                assigned_bcells = self._match_simpy(antigens)
+
+        for gc in self.gcs:
+            gc.seed_naive_cells(assigned_bcells[gc.id])
+            # print(len(gc.bcells))
+
+    def _match_matrix(self, antigens: List[Antigen]):
+        """Asignación en bloque con la matriz completa de afinidades (ver `match_bcells`)."""
+        assigned_bcells = {ag.id: [] for ag in antigens}
+        if len(self.bcells_pool) == 0:
+            return assigned_bcells
+        receptors = np.array([bc.receptors for bc in self.bcells_pool], dtype=np.float64)
+        epitopes = np.array([ag.epitope_vector for ag in antigens], dtype=np.float64)
+        assigned, affinity = match_bcells(receptors, epitopes, self.params["THRESHOLD"], attempts=self.params["matching_steps"], rng=self.rng)
+        for a, ag in enumerate(antigens):
+            for i in assigned[a]:
+                bc_candidate = self.bcells_pool[i]
+                bc_candidate.serotype = ag.serotype
+                bc_candidate.affinity = affinity[a, i]
+                assigned_bcells[ag.id].append(bc_candidate)
+        return assigned_bcells
+
+    def _match_simpy(self, antigens: List[Antigen]):
         env = simpy.Environment()
 
         # bcell_store = simpy.FilterStore(env, capacity=len(self.bcells_pool))
@@ -32,14 +69,21 @@ class ImmuneSystem:
 
         assigned_bcells = {ag.id: [] for ag in antigens}
         access_lock = [simpy.Resource(env, capacity=1) for i in range(len(self.bcells_pool))]
+        # Afinidades de toda la reserva precalculadas; cada intento solo consulta la matriz
+        if len(self.bcells_pool) > 0:
+            affinities = compute_affinity_batch(
+                np.array([bc.receptors for bc in self.bcells_pool], dtype=np.float64),
+                np.array([ag.epitope_vector for ag in antigens], dtype=np.float64),
+            )
 
-        def antigen_process(ag: Antigen):
+        def antigen_process(a: int, ag: Antigen):
             while True:
                 if len(self.bcells_pool) == 0:
                     break
 
                 # Selección aleatoria sin lock, pero luego intentar obtener la célula con get()
-                bc_candidate = random.choice(self.bcells_pool)
+                index = int(self.rng.integers(len(self.bcells_pool)))
+                bc_candidate = self.bcells_pool[index]
                 # print(f"antigeno {ag.serotype} request to {bc_candidate.id}")
                 resource = access_lock[bc_candidate.id]
                 if resource.count > 0 or bc_candidate.serotype != "":
@@ -47,7 +91,7 @@ class ImmuneSystem:
                 
                 req = resource.request()
                 yield req
-                affinity = compute_affinity(ag.epitope_vector, bc_candidate.receptors)
+                affinity = affinities[a, index]
 
                 if affinity >= self.params["THRESHOLD"]:
                     # try:
@@ -73,16 +117,13 @@ class ImmuneSystem:
         
 
 
-        for ag in antigens:
-            env.process(antigen_process(ag))
+        for a, ag in enumerate(antigens):
+            env.process(antigen_process(a, ag))
 
-        env.run(until=200)
-
-        for gc in self.gcs:
-            gc.seed_naive_cells(assigned_bcells[gc.id])
-            # print(len(gc.bcells))
+        env.run(until=self.params["matching_steps"])
         
         # self.bcells_pool = list(bcell_store.items)
+        return assigned_bcells
  
     def cycle(self):
         # bc = []
@@ -100,21 +141,23 @@ class ImmuneSystem:
         # pass
         # for ag in self.memory_pool.keys():
         #     self.memory_pool[ag] = [cell for cell in self.memory_pool[ag] if random.random() >= SIMULATION_PARAMS["decay_factor"]]
-        for ag in self.plasma_pool.keys():
-            self.plasma_pool[ag] = [cell for cell in self.plasma_pool[ag] if random.random() >= self.params["decay_factor"]]
+        # Cada plasmática sobrevive al día con probabilidad 1 - decay_factor
+        self.plasma_pool.turnover(1 - self.params["decay_factor"], self.rng)
 
     def initialize_naive(self,num_cells: int = 10000, receptor_length: int = 5) -> List['BCell']:
             """Genera células B naive con receptores aleatorios"""
+            receptors = self.rng.random((num_cells, receptor_length))
             return [
                 BCell(
                     id=i,
-                    receptors=[random.random() for _ in range(receptor_length)]
+                    receptors=receptors[i].tolist()
                 ) for i in range(num_cells)
             ]
 
 
     def vaccinate(self, antigens: List[Antigen]):
-        self.bcells_pool = self.initialize_naive()
+        self.profiler.day = self.day
+        self.bcells_pool = self.initialize_naive(self.params["naive_pool_size"], len(antigens[0].epitope_vector))
         self.fillCGs(antigens)
         # for gc in self.gcs:
         #     with open("log_simulacion.txt", "a") as f:
@@ -130,25 +173,99 @@ class ImmuneSystem:
         #         self.plasma_pool[cell.serotype].append(cell)
             
     def step(self):
-        for gc in self.gcs:
-            # with open("log_simulacion.txt", "a") as f:
-            #     f.write(f"serotipo {gc.antigen.serotype}, b antes{len(gc.bcells)}\n")
-            
-            memory, plasma = gc.run_cycle()
+        self.profiler.day = self.day
+        # Los CG son independientes dentro del día (cada uno tiene su propio Generator);
+        # con gc_workers > 1 se avanzan en paralelo y sus salidas se suman a los pools
+        # siempre en el orden de self.gcs, así el resultado no depende de los hilos
+        if self.params["gc_workers"] > 1 and len(self.gcs) > 1:
+            outputs = list(self._gc_executor().map(GerminalCenter.run_cycle, self.gcs))
+        else:
+            outputs = [gc.run_cycle() for gc in self.gcs]
+        for gc, (memory, plasma) in zip(self.gcs, outputs):
             # with open("log_simulacion.txt", "a") as f:
             #     f.write(f"serotipo {gc.antigen.serotype}, b despues{len(gc.bcells)}\n")
             #     f.write(f"memoria {len(memory)}\n")
             #     f.write(f"plasma {len(plasma)}\n")
-            for cell in memory:
-                self.memory_pool[cell.serotype].append(cell)
-            for cell in plasma:
-                self.plasma_pool[cell.serotype].append(cell)
+            self.memory_pool.add(gc.antigen.serotype, memory)
+            self.plasma_pool.add(gc.antigen.serotype, plasma)
         
-        for ag in self.antibody_levels.keys():
-            plasma_production = len(self.plasma_pool[ag]) * self.params["plasma_production_factor"]
-            memory_production = len(self.memory_pool[ag]) * self.params["memory_production_factor"]
-            self.antibody_levels[ag] = (
-                (self.antibody_levels[ag] + plasma_production + memory_production) * self.params["decay_factor"]
-            )
+        with self.profiler.phase("antibody_update"):
+            for ag in self.antibody_levels.keys():
+                plasma_production = self.plasma_pool.count(ag) * self.params["plasma_production_factor"]
+                memory_production = self.memory_pool.count(ag) * self.params["memory_production_factor"]
+                self.antibody_levels[ag] = (
+                    (self.antibody_levels[ag] + plasma_production + memory_production) * self.params["decay_factor"]
+                )
+
+        with self.profiler.phase("plasma_turnover"):
+            self.cycle()
+        self.day += 1
+
+    def is_quiescent(self) -> bool:
+        """Sin actividad de CG: solo quedan el decaimiento de anticuerpos y el recambio de plasmáticas."""
+        return all(gc.is_quiescent() for gc in self.gcs)
+
+    def fast_forward(self, days: int):
+        """
+        Avanza `days` días quiescentes de una vez (ver `is_quiescent`).
+
+        Equivale en distribución a `days` llamadas a `step`: el recambio de plasmáticas
+        se sortea en bloque (`turnover_path`) y los anticuerpos siguen la recurrencia
+        A_{j+1} = (A_j + producción_j) * decay_factor resuelta en forma cerrada:
+        A_days = A_0 * d^days + sum_j producción_j * d^(days - j).
+        """
+        if days <= 0:
+            return
+        self.profiler.day = self.day
+        with self.profiler.phase("fast_forward", size=days):
+            d = self.params["decay_factor"]
+            weights = d ** np.arange(days, 0, -1)
+            plasma = self.plasma_pool.turnover_path(days, 1 - d, self.rng)
+            for ag in self.antibody_levels.keys():
+                production = (
+                    plasma[ag] * self.params["plasma_production_factor"]
+                    + np.asarray(self.memory_pool.count(ag))[..., None] * self.params["memory_production_factor"]
+                )
+                level = self.antibody_levels[ag] * d**days + production @ weights
+                self.antibody_levels[ag] = level if np.ndim(level) else float(level)
+        for gc in self.gcs:
+            gc.cycles += days
+        self.day += days
+
+    def fork(self, rng = None) -> "ImmuneSystem":
+        """
+        Copia independiente del estado actual (CG, pools, anticuerpos, día y RNG).
+
+        Sin `rng`, la copia hereda el estado del RNG: avanzada igual que el original da
+        exactamente el mismo resultado, y dos ramas que difieren solo en el esquema de
+        vacunación comparten los números aleatorios (menos varianza al compararlas). Con
+        `rng`, la copia y sus CG se vuelven a sembrar desde él. Se comparten los
+        parámetros, los antígenos, el profiler y la reserva naive de la última
+        vacunación (`bcells_pool`: solo se lee después de asignarla a los CG, y la
+        próxima vacunación crea una nueva); el pool de hilos no se copia.
+        """
+        shared = {id(self.params): self.params, id(self.profiler): self.profiler, id(self._executor): None}
+        shared.update((id(ag), ag) for ag in self.antigens)
+        shared[id(self.bcells_pool)] = self.bcells_pool
+        shared.update((id(cell), cell) for cell in self.bcells_pool)
+        clone = copy.deepcopy(self, shared)
+        if rng is not None:
+            clone.rng = ensure_rng(rng)
+            for gc, gc_rng in zip(clone.gcs, spawn_rngs(clone.rng, len(clone.gcs))):
+                gc.rng = gc_rng
+        return clone
+
+    def snapshot(self) -> "ImmuneSystem":
+        """Copia del estado actual para guardar y seguir después con `fork` (ver `fork`)."""
+        return self.fork()
+
+    def _gc_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.params["gc_workers"])
+        return self._executor
 
-        self.cycle()
+    def close(self):
+        """Libera los hilos usados para avanzar los CG en paralelo."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
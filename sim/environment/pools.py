@@ -0,0 +1,131 @@
+# environment/pools.py
+from typing import Dict, List
+import numpy as np
+from agents.population import BCellPopulation
+
+def _lifetime_probabilities(days: int, survival: float) -> np.ndarray:
+    # P(una célula sobrevive exactamente t recambios) para t < days, y P(sobrevive los days)
+    t = np.arange(days + 1)
+    probs = survival ** t
+    probs[:-1] *= 1.0 - survival
+    return probs
+
+def _affinities(cells):
+    if isinstance(cells, BCellPopulation):
+        return cells.affinity
+    return np.array([cell.affinity for cell in cells], dtype=np.float64)
+
+class CellPool:
+    """
+    Pool de células diferenciadas (memoria o plasma) que guarda cada BCell.
+
+    Modo "cells": conserva los objetos para estudios de linaje, a costa de memoria y de
+    un sorteo por célula y día en el recambio.
+    """
+    def __init__(self, serotypes: List[str]):
+        self.cells: Dict[str, list] = {s: [] for s in serotypes}
+
+    def add(self, serotype: str, cells):
+        if isinstance(cells, BCellPopulation):
+            cells = cells.to_bcells()
+        self.cells[serotype].extend(cells)
+
+    def count(self, serotype: str) -> int:
+        return len(self.cells[serotype])
+
+    def turnover(self, survival: float, rng: np.random.Generator):
+        """Cada célula sobrevive al día con probabilidad `survival`."""
+        for s in self.cells:
+            keep = rng.random(len(self.cells[s])) < survival
+            self.cells[s] = [cell for cell, alive in zip(self.cells[s], keep) if alive]
+
+    def turnover_path(self, days: int, survival: float, rng: np.random.Generator) -> Dict[str, np.ndarray]:
+        """
+        Equivale a `days` llamadas a `turnover`, sorteando de una vez cuántos recambios
+        sobrevive cada célula.
+
+        Returns:
+            {serotipo: conteo al inicio de cada uno de los `days` días}.
+        """
+        probs = _lifetime_probabilities(days, survival)
+        path = {}
+        for s in self.cells:
+            lifetimes = rng.choice(days + 1, size=len(self.cells[s]), p=probs)
+            path[s] = len(lifetimes) - np.concatenate(([0], np.cumsum(np.bincount(lifetimes, minlength=days + 1))[:days - 1]))
+            self.cells[s] = [cell for cell, t in zip(self.cells[s], lifetimes) if t == days]
+        return path
+
+    def __getitem__(self, serotype: str) -> list:
+        return self.cells[serotype]
+
+class CountPool:
+    """
+    Pool agregado: solo cuenta células por serotipo, opcionalmente por intervalo de afinidad.
+
+    Modo "counts": el recambio diario es una única extracción binomial por serotipo e
+    intervalo, en lugar de una por célula.
+
+    Args:
+        serotypes: serotipos del pool.
+        bins: bordes de los intervalos de afinidad (p. ej. [0.4, 0.6, 0.8]); None usa
+            un único intervalo.
+        individuals: tamaño de la cohorte virtual. Si se indica, los conteos tienen
+            forma (individuals, intervalos), las células se reparten según su
+            `individual` y `count` devuelve un arreglo (individuals,).
+    """
+    def __init__(self, serotypes: List[str], bins=None, individuals=None):
+        self.bins = None if bins is None else np.asarray(bins, dtype=np.float64)
+        self.individuals = individuals
+        n_bins = 1 if self.bins is None else len(self.bins) + 1
+        shape = (n_bins,) if individuals is None else (individuals, n_bins)
+        self.counts: Dict[str, np.ndarray] = {s: np.zeros(shape, dtype=np.int64) for s in serotypes}
+
+    def add(self, serotype: str, cells):
+        if self.individuals is not None:
+            bin_index = 0 if self.bins is None else np.digitize(_affinities(cells), self.bins)
+            np.add.at(self.counts[serotype], (cells.individual, bin_index), 1)
+        elif self.bins is None:
+            self.counts[serotype][0] += len(cells)
+        else:
+            self.counts[serotype] += np.bincount(np.digitize(_affinities(cells), self.bins), minlength=len(self.bins) + 1)
+
+    def count(self, serotype: str):
+        total = self.counts[serotype].sum(axis=-1)
+        return int(total) if self.individuals is None else total
+
+    def turnover(self, survival: float, rng: np.random.Generator):
+        """Sobrevivientes ~ Binomial(n, survival) en cada serotipo e intervalo."""
+        for s in self.counts:
+            self.counts[s] = rng.binomial(self.counts[s], survival)
+
+    def turnover_path(self, days: int, survival: float, rng: np.random.Generator) -> Dict[str, np.ndarray]:
+        """
+        Equivale a `days` llamadas a `turnover` con una sola extracción multinomial por
+        serotipo e intervalo: cuántas células mueren en cada día y cuántas siguen vivas.
+
+        Returns:
+            {serotipo: conteo total al inicio de cada uno de los `days` días}, de forma
+            (days,) o (individuals, days).
+        """
+        probs = _lifetime_probabilities(days, survival)
+        path = {}
+        for s in self.counts:
+            deaths = rng.multinomial(self.counts[s], probs)  # (..., intervalos, days + 1)
+            died = np.cumsum(deaths[..., :days - 1].sum(axis=-2), axis=-1)
+            path[s] = self.counts[s].sum(axis=-1)[..., None] - np.concatenate([np.zeros(died.shape[:-1] + (1,), dtype=died.dtype), died], axis=-1)
+            self.counts[s] = deaths[..., days]
+        return path
+
+    def __getitem__(self, serotype: str) -> np.ndarray:
+        return self.counts[serotype]
+
+def make_pool(serotypes: List[str], params, individuals=None):
+    """
+    Pool según params["pool_mode"]: "counts" (agregado) o "cells" (por célula).
+    Una cohorte virtual (`individuals`) usa siempre conteos.
+    """
+    if individuals is not None:
+        return CountPool(serotypes, bins=params["pool_affinity_bins"], individuals=individuals)
+    if params["pool_mode"] == "cells":
+        return CellPool(serotypes)
+    return CountPool(serotypes, bins=params["pool_affinity_bins"])
@@ -1,16 +1,17 @@
 # main.py
-import random
-import time
 from typing import List
-from matplotlib import pyplot as plt
+import numpy as np
 from config import *
 from agents.antigen import Antigen
 from agents.BCell import BCell
 from environment.immune_system import ImmuneSystem
+from environment.cohort import CohortImmuneSystem
+from profiling import Profiler, NULL_PROFILER
+from recorder import TrajectoryRecorder
+from utils import ensure_rng
 
-def main():
-    # 1. Inicializa antígenos (serotipos de PCV)
-
+def build_antigens() -> List[Antigen]:
+    """Antígenos de la vacuna conjugada 7-valente (serotipos de PCV)"""
     epitope_vectors = {
         "1":  [0.72, 0.15, 0.40, 0.85, 0.50],
         "5":  [0.68, 0.20, 0.35, 0.80, 0.55],
@@ -32,36 +33,106 @@ def main():
         Antigen(id = 6,serotype="19F", polysaccharide_ug=2.2, carrier_protein="TT", immunogenicity_factor=1.0, epitope_vector=epitope_vectors["19F"]),
         Antigen(id = 7,serotype="23F", polysaccharide_ug=2.2, carrier_protein="TT", immunogenicity_factor=1.0, epitope_vector=epitope_vectors["23F"]),
     ]
+    return antigens
+
+# Orden de los serotipos en los resultados apilados (ver ensemble.run_ensemble)
+SEROTYPES = [ag.serotype for ag in build_antigens()]
+
+def run_schedule(immune_system, antigens, params, recorder, replicate=0):
+    """
+    Avanza `immune_system` desde el día 0 hasta params["duration_days"], vacunando
+    según params["vaccination_schedule"] y registrando en `recorder`.
+
+    Con params["fast_forward"], los tramos sin actividad de CG (ver
+    ImmuneSystem.is_quiescent) se saltan de una vez hasta el próximo evento: una dosis,
+    un día de muestreo o el final de la corrida.
+    """
+    run_schedule_tree(immune_system, antigens, params, [(params["vaccination_schedule"], recorder, replicate)])
+
+def run_schedule_tree(immune_system, antigens, params, branches):
+    """
+    Como `run_schedule` para varios esquemas de vacunación a la vez.
+
+    Los esquemas se simulan juntos mientras coinciden; el día en que uno vacuna y otro
+    no, el sistema se bifurca (ImmuneSystem.fork) y cada grupo sigue por su lado. Así
+    el tramo común (p. ej. todo hasta la segunda dosis) se simula una sola vez. Las
+    ramas heredan el estado del RNG, así que comparten los números aleatorios.
+
+    Args:
+        branches: lista de (esquema, recorder, replicate); cada rama registra en su
+            recorder en sus propios días de muestreo.
+    """
+    duration = params["duration_days"]
+    groups = [(immune_system, 0, [(sorted(schedule), recorder, replicate) for schedule, recorder, replicate in branches])]
+    while groups:
+        system, day, group = groups.pop()
+        while day < duration:
+            dosing = [branch for branch in group if day in branch[0]]
+            if dosing and len(dosing) < len(group):
+                waiting = [branch for branch in group if day not in branch[0]]
+                groups.append((system.fork(), day, waiting))
+                group = dosing
+            if dosing:
+                system.vaccinate(antigens)
+            for _, recorder, replicate in group:
+                recorder.record(day, system, replicate)
+            if params["fast_forward"] and system.is_quiescent():
+                next_event = min([duration] + [_next_event(day, schedule, recorder) for schedule, recorder, _ in group])
+                system.fast_forward(next_event - day)
+                day = next_event
+            else:
+                system.step()
+                day += 1
+
+def _next_event(day, schedule, recorder):
+    # Próxima dosis o día de muestreo de una rama (infinito si no quedan)
+    next_dose = next((d for d in schedule if d > day), np.inf)
+    next_sample = recorder.next_day(day)
+    return min(next_dose, np.inf if next_sample is None else next_sample)
+
+def main(profile_path=None, seed=None, params=SIMULATION_PARAMS, plot=True):
+    """
+    Simulación diaria con gráfico; con `profile_path` guarda el perfil por fase (ver
+    profiling.Profiler).
+
+    Returns:
+        (días, {serotipo: anticuerpos diarios}).
+    """
+    rng = np.random.default_rng(seed)
+    # 1. Inicializa antígenos (serotipos de PCV)
+    antigens = build_antigens()
 
     def initialize_naive(num_cells: int = 1000, receptor_length: int = 5) -> List['BCell']:
         """Genera células B naive con receptores aleatorios"""
+        receptors = rng.random((num_cells, receptor_length))
         return [
             BCell(
                 id=i,
-                receptors=[random.random() for _ in range(receptor_length)]
+                receptors=receptors[i].tolist()
             ) for i in range(num_cells)
         ]
 
     # 2. Inicializa sistema inmune
-    immune_system = ImmuneSystem(antigens, initialize_naive())
+    profiler = Profiler() if profile_path is not None else NULL_PROFILER
+    immune_system = ImmuneSystem(antigens, initialize_naive(), params, profiler=profiler, rng=rng)
     # 3. Simula esquema de vacunación y seguimiento
     
-    antibody_levels = {s.serotype: [] for s in antigens}
-    time_points = list(range(SIMULATION_PARAMS["duration_days"]))
+    time_points = list(range(params["duration_days"]))
+    recorder = TrajectoryRecorder(SEROTYPES, time_points)
         
-    for day in range(SIMULATION_PARAMS["duration_days"]):
-        # with open("log_simulacion.txt", "a") as f:
-        #     f.write(f"dia {day}\n")
-        # print(day)
-        inicio = time.perf_counter()
-        if day in SIMULATION_PARAMS["vaccination_schedule"]:
-            immune_system.vaccinate(antigens)
-        # Registrar datos diariamente
-        for serotype in antibody_levels:
-            antibody_levels[serotype].append(immune_system.antibody_levels[serotype])
-        immune_system.step()
-        fin = time.perf_counter()
-        # print(fin-inicio)
+    # Registrar datos diariamente
+    run_schedule(immune_system, antigens, params, recorder)
+    antibody_levels = dict(zip(SEROTYPES, recorder.data["antibody"][0]))
+    if profile_path is not None:
+        profiler.save(profile_path)
+    if plot:
+        plot_antibodies(time_points, antibody_levels)
+    return time_points, antibody_levels
+
+def plot_antibodies(time_points, antibody_levels):
+    """Gráfico de los anticuerpos diarios por serotipo ({serotipo: niveles})."""
+    # matplotlib se importa recién aquí: las réplicas en otros procesos no lo necesitan
+    from matplotlib import pyplot as plt
     plt.figure(figsize=(12, 7))
     for serotype, levels in antibody_levels.items():
         plt.plot(time_points, levels, label=f"Serotipo {serotype}", alpha=0.8)
@@ -79,69 +150,61 @@ if __name__ == "__main__":
     main()
 
 
-def sim(params, times):
+def sim(params, times, seed=None):
+    # Un Generator hijo por réplica (ver ensemble.run_ensemble para la versión en paralelo)
+    rngs = np.random.default_rng(seed).spawn(times)
     res = []
     while times > 0:
         print(times)
         # print("aaaaaaa")
-        res.append(la(params))
+        res.append(la(params, rng=rngs[len(rngs) - times]))
         times -=1
     return res
 
-def la(params):
-    # 1. Inicializa antígenos (serotipos de PCV)
+def sample_days(params):
+    """Días en que `la` registra los anticuerpos: 30 días después de la 2da y 3ra dosis."""
+    return [params["vaccination_schedule"][1] + 30, params["vaccination_schedule"][2] + 30]
 
-    epitope_vectors = {
-        "1":  [0.72, 0.15, 0.40, 0.85, 0.50],
-        "5":  [0.68, 0.20, 0.35, 0.80, 0.55],
-        "6B": [0.75, 0.18, 0.42, 0.88, 0.48],
-        "14": [0.70, 0.22, 0.38, 0.82, 0.52],
-        "18C": [0.65, 0.25, 0.36, 0.78, 0.58],
-        "19F": [0.73, 0.17, 0.41, 0.84, 0.49],
-        "23F": [0.69, 0.19, 0.37, 0.81, 0.53],
-    }
+def la(params, recorder=None, replicate=0, rng=None):
+    """
+    Corre una simulación completa con `params`.
 
-    
-    # Inicialización de la vacuna con los antígenos indicados
-    antigens = [
-        Antigen(id = 1,serotype="1", polysaccharide_ug=2.2, carrier_protein="TT", immunogenicity_factor=1.0, epitope_vector=epitope_vectors["1"]),
-        Antigen(id = 2,serotype="5", polysaccharide_ug=2.2, carrier_protein="TT", immunogenicity_factor=1.0, epitope_vector=epitope_vectors["5"]),
-        Antigen(id = 3,serotype="6B", polysaccharide_ug=4.4, carrier_protein="TT", immunogenicity_factor=1.0, epitope_vector=epitope_vectors["6B"]),
-        Antigen(id = 4,serotype="14", polysaccharide_ug=2.2, carrier_protein="TT", immunogenicity_factor=1.0, epitope_vector=epitope_vectors["14"]),
-        Antigen(id = 5,serotype="18C", polysaccharide_ug=2.2, carrier_protein="TT", immunogenicity_factor=1.0, epitope_vector=epitope_vectors["18C"]),
-        Antigen(id = 6,serotype="19F", polysaccharide_ug=2.2, carrier_protein="TT", immunogenicity_factor=1.0, epitope_vector=epitope_vectors["19F"]),
-        Antigen(id = 7,serotype="23F", polysaccharide_ug=2.2, carrier_protein="TT", immunogenicity_factor=1.0, epitope_vector=epitope_vectors["23F"]),
-    ]
+    Args:
+        recorder (TrajectoryRecorder): dónde registrar los observables; por defecto
+            solo los anticuerpos en `sample_days(params)`.
+        replicate (int): fila del recorder en la que se escribe.
+        rng (np.random.Generator): fuente de aleatoriedad de la réplica.
+
+    Returns:
+        dict: {serotipo: [anticuerpos en cada día de muestreo]} si se registran anticuerpos.
+    """
+    rng = ensure_rng(rng)
+    # 1. Inicializa antígenos (serotipos de PCV)
+    antigens = build_antigens()
 
     def initialize_naive(num_cells: int = 1000, receptor_length: int = 5) -> List['BCell']:
         """Genera células B naive con receptores aleatorios"""
+        receptors = rng.random((num_cells, receptor_length))
         return [
             BCell(
                 id=i,
-                receptors=[random.random() for _ in range(receptor_length)]
+                receptors=receptors[i].tolist()
             ) for i in range(num_cells)
         ]
 
     # 2. Inicializa sistema inmune
-    immune_system = ImmuneSystem(antigens, initialize_naive(), params)
+    immune_system = ImmuneSystem(antigens, initialize_naive(), params, rng=rng)
     # 3. Simula esquema de vacunación y seguimiento
-    
-    antibody_levels = {s.serotype: [] for s in antigens}
-    time_points = list(range(params["duration_days"]))
+    if recorder is None:
+        recorder = TrajectoryRecorder(SEROTYPES, sample_days(params))
 
-    for day in range(params["duration_days"]):
-        # with open("log_simulacion.txt", "a") as f:
-        #     f.write(f"dia {day}\n")
-        # print(day)
-        if day in params["vaccination_schedule"]:
-            immune_system.vaccinate(antigens)
-        # Registrar datos diariamente
-        for serotype in antibody_levels:
-            if ((day == params["vaccination_schedule"][1] + 30) or (day == params["vaccination_schedule"][2] + 30)):
-                antibody_levels[serotype].append(immune_system.antibody_levels[serotype])
-        immune_system.step()
+    # Registrar datos en los días de muestreo
+    run_schedule(immune_system, antigens, params, recorder, replicate)
     
-    return antibody_levels
+    if "antibody" not in recorder.observables:
+        return None
+    levels = recorder.data["antibody"][replicate]
+    return {serotype: levels[i].tolist() for i, serotype in enumerate(recorder.serotypes)}
 
     # plt.figure(figsize=(12, 7))
     # for serotype, levels in antibody_levels.items():
@@ -154,3 +217,58 @@ def la(params):
     # plt.legend()
     # plt.grid(True, alpha=0.3)
     # plt.show()
+
+def la_cohort(params, individuals, rng=None, baseline=None, recorder=None):
+    """
+    Como `la`, pero simula de una vez una cohorte virtual de `individuals` individuos
+    (ver CohortImmuneSystem).
+
+    Args:
+        baseline (dict): anticuerpos previos a la vacunación por serotipo (escalar o
+            arreglo (individuals,)).
+        recorder (TrajectoryRecorder): con `replicates=individuals`; por defecto solo
+            los anticuerpos en `sample_days(params)`.
+
+    Returns:
+        np.ndarray: forma (individuo, serotipo, día de muestreo), como `run_ensemble`.
+    """
+    rng = ensure_rng(rng)
+    antigens = build_antigens()
+    immune_system = CohortImmuneSystem(antigens, individuals, params, rng=rng, baseline=baseline)
+    if recorder is None:
+        recorder = TrajectoryRecorder(SEROTYPES, sample_days(params), replicates=individuals)
+    run_schedule(immune_system, antigens, params, recorder, slice(None))
+    if "antibody" not in recorder.observables:
+        return None
+    return np.array(recorder.data["antibody"])
+
+def la_schedules(params, schedules, rng=None, individuals=None):
+    """
+    Como `la` para varios esquemas de vacunación, simulando una sola vez los tramos
+    que comparten (ver `run_schedule_tree`). Cada esquema se muestrea en sus propios
+    `sample_days`, 30 días después de su 2da y 3ra dosis.
+
+    Args:
+        schedules (list): esquemas de vacunación (como params["vaccination_schedule"]).
+        individuals (int): si se indica, cada esquema se aplica a una cohorte virtual
+            (ver `la_cohort`).
+
+    Returns:
+        np.ndarray: forma (esquema, serotipo, día de muestreo), o (esquema, individuo,
+        serotipo, día de muestreo) con `individuals`.
+    """
+    rng = ensure_rng(rng)
+    antigens = build_antigens()
+    if individuals is None:
+        immune_system = ImmuneSystem(antigens, [], params, rng=rng)
+        immune_system.bcells_pool = immune_system.initialize_naive(1000, len(antigens[0].epitope_vector))
+        replicates, replicate = 1, 0
+    else:
+        immune_system = CohortImmuneSystem(antigens, individuals, params, rng=rng)
+        replicates, replicate = individuals, slice(None)
+    recorders = [
+        TrajectoryRecorder(SEROTYPES, sample_days({**params, "vaccination_schedule": schedule}), replicates=replicates)
+        for schedule in schedules
+    ]
+    run_schedule_tree(immune_system, antigens, params, [(schedule, recorder, replicate) for schedule, recorder in zip(schedules, recorders)])
+    return np.array([recorder.data["antibody"][replicate] for recorder in recorders])
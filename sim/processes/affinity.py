@@ -1,9 +1,51 @@
 # processes/affinity.py
 import numpy as np
 
+# Máximo de elementos del arreglo temporal (epítopos x células x largo) por bloque
+AFFINITY_CHUNK_ELEMENTS = 1 << 22
+
 def compute_affinity(antigen_epitopo, bcell_receptor):
     # bcell_receptor y antigen_epitopo son vectores numéricos
     # distancia euclídea y función exponencial
-    distancia = np.linalg.norm(np.array(bcell_receptor) - np.array(antigen_epitopo))
-    afinidad = np.exp(-distancia)  # Afinidad entre 0 y 1, mayor si distancia es pequeña
-    return afinidad
+    # Un par de vectores: cálculo directo (compute_affinity_batch da lo mismo, pero su
+    # preparación por bloques triplica el costo por llamada)
+    receptor = np.asarray(bcell_receptor, dtype=np.float64)
+    epitope = np.asarray(antigen_epitopo, dtype=np.float64)
+    if receptor.ndim == 1 and epitope.ndim == 1:
+        return np.exp(-np.linalg.norm(receptor - epitope))  # Afinidad entre 0 y 1, mayor si distancia es pequeña
+    # Varios receptores o epítopos (2-D): kernel en bloque
+    result = compute_affinity_batch(np.atleast_2d(receptor), epitope)
+    return result[..., 0] if receptor.ndim == 1 else result
+
+def compute_affinity_batch(receptors, epitopes, chunk_size=None, dtype=np.float64):
+    """
+    Afinidad exp(-||receptor - epítopo||) para muchos receptores y uno o varios epítopos.
+
+    Args:
+        receptors (np.ndarray): matriz de receptores, forma (N, L).
+        epitopes (np.ndarray): un epítopo de forma (L,) o varios de forma (A, L).
+        chunk_size (int): filas de receptores procesadas por bloque; por defecto se
+            elige para que el temporal no supere AFFINITY_CHUNK_ELEMENTS elementos.
+        dtype: np.float64 o np.float32 (menos memoria y más rápido en poblaciones grandes).
+
+    Returns:
+        np.ndarray: afinidades de forma (N,) si se pasó un solo epítopo, o (A, N).
+    """
+    receptors = np.asarray(receptors, dtype=dtype)
+    epitopes = np.asarray(epitopes, dtype=dtype)
+    single = epitopes.ndim == 1
+    epitopes = np.atleast_2d(epitopes)
+    n_epitopes, n_cells = epitopes.shape[0], receptors.shape[0]
+
+    if chunk_size is None:
+        chunk_size = max(1, AFFINITY_CHUNK_ELEMENTS // max(1, n_epitopes * receptors.shape[1]))
+
+    out = np.empty((n_epitopes, n_cells), dtype=dtype)
+    for start in range(0, n_cells, chunk_size):
+        block = receptors[start:start + chunk_size]
+        diff = block[None, :, :] - epitopes[:, None, :]
+        np.einsum('anl,anl->an', diff, diff, out=out[:, start:start + chunk_size])
+    np.sqrt(out, out=out)
+    np.negative(out, out=out)
+    np.exp(out, out=out)  # Afinidad entre 0 y 1, mayor si distancia es pequeña
+    return out[0] if single else out
@@ -19,3 +19,14 @@ def differentiate_bcell(bcell, affinity_threshold_memory = SIMULATION_PARAMS["af
         return 'plasma'
     else:
         return 'NO'
+
+def differentiation_masks(affinities, affinity_threshold_memory = SIMULATION_PARAMS["affinity_threshold_memory"], affinity_threshold_plasma=SIMULATION_PARAMS["affinity_threshold_plasma"]):
+    """
+    Versión vectorizada de `differentiate_bcell` sobre un arreglo de afinidades.
+    
+    Returns:
+        (memory_mask, plasma_mask): máscaras booleanas disjuntas con el mismo largo que `affinities`.
+    """
+    memory_mask = affinities >= affinity_threshold_memory
+    plasma_mask = ~memory_mask & (affinities >= affinity_threshold_plasma)
+    return memory_mask, plasma_mask
@@ -0,0 +1,118 @@
+# processes/kernels.py
+"""
+Ciclo del centro germinal compilado con Numba (gc_backend "numba").
+
+Selección, diferenciación, muerte y mutación se hacen en dos kernels que recorren la
+población una vez cada uno, en lugar de una operación de NumPy (y un temporal) por
+etapa. Los números aleatorios se sortean afuera con el Generator del CG, en el mismo
+orden y con las mismas formas que `GerminalCenter._run_cycle_numpy`, así que ambos
+caminos consumen el RNG igual y dan la misma población (salvo el orden de las
+células seleccionadas y el redondeo de la afinidad).
+
+Numba es opcional: si no está instalado, NUMBA_AVAILABLE es False y GerminalCenter usa
+el camino de NumPy. Los kernels siguen definidos como Python puro (lentos, útiles para
+probarlos sin compilar).
+
+Los kernels liberan el GIL (nogil), así que con gc_workers > 1 pueden solaparse
+entre CG; el sorteo de números aleatorios y el armado de la población siguen
+tomando el GIL (ver "gc_workers" en config.py).
+"""
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda fn: fn
+
+@njit(cache=True, nogil=True)
+def select_differentiate_kernel(affinity, gumbel, death_u, temperature, max_survivors,
+                                affinity_threshold_memory, affinity_threshold_plasma, lf_decay):
+    """
+    Selección de Boltzmann (Gumbel-top-k), diferenciación y muerte diaria.
+
+    Args:
+        affinity (np.ndarray): afinidades de la población, (N,).
+        gumbel (np.ndarray): ruido Gumbel(0, 1) de la selección, (N,).
+        death_u (np.ndarray): uniformes de la muerte diaria, (N,).
+
+    Returns:
+        (memory_idx, plasma_idx, keep_idx): índices de las seleccionadas que pasan a
+        memoria y a plasmáticas, y de las que quedan en el centro germinal.
+    """
+    n = affinity.shape[0]
+    selected = np.zeros(n, dtype=np.bool_)
+    k = min(max(max_survivors, 0), n)
+    if k == n:
+        selected[:] = True
+    elif k > 0:
+        keys = affinity / temperature + gumbel
+        threshold = np.partition(keys.copy(), n - k)[n - k]
+        taken = 0
+        for i in range(n):
+            if keys[i] >= threshold and taken < k:
+                selected[i] = True
+                taken += 1
+
+    memory_idx = np.empty(n, dtype=np.int64)
+    plasma_idx = np.empty(n, dtype=np.int64)
+    keep_idx = np.empty(n, dtype=np.int64)
+    n_memory = n_plasma = n_keep = 0
+    for i in range(n):
+        if selected[i] and affinity[i] >= affinity_threshold_memory:
+            memory_idx[n_memory] = i
+            n_memory += 1
+        elif selected[i] and affinity[i] >= affinity_threshold_plasma:
+            plasma_idx[n_plasma] = i
+            n_plasma += 1
+        elif death_u[i] > lf_decay:
+            keep_idx[n_keep] = i
+            n_keep += 1
+    return memory_idx[:n_memory], plasma_idx[:n_plasma], keep_idx[:n_keep]
+
+@njit(cache=True, nogil=True)
+def mutate_rescore_kernel(receptors, affinity, keep_idx, mutate_u, mutation_p,
+                          components_u, mutation_rate, noise, epitope):
+    """
+    Población del día siguiente: las sobrevivientes seguidas de sus mutantes.
+
+    Cada sobreviviente j genera un mutante si mutate_u[j] < mutation_p; el m-ésimo
+    mutante usa la fila m de `components_u` y `noise` (forma (mutantes, L)), y su
+    afinidad se recalcula contra `epitope`.
+
+    Returns:
+        (receptors, affinity, source): arreglos de la nueva población y, para cada
+        fila, la fila de origen en la población anterior (para copiar serotipo, id e
+        individuo).
+    """
+    n_keep = keep_idx.shape[0]
+    length = receptors.shape[1]
+    n_mutants = components_u.shape[0]
+    total = n_keep + n_mutants
+    new_receptors = np.empty((total, length))
+    new_affinity = np.empty(total)
+    source = np.empty(total, dtype=np.int64)
+    m = 0
+    for j in range(n_keep):
+        parent = keep_idx[j]
+        new_receptors[j] = receptors[parent]
+        new_affinity[j] = affinity[parent]
+        source[j] = parent
+        if mutate_u[j] < mutation_p:
+            row = n_keep + m
+            distance = 0.0
+            for l in range(length):
+                value = receptors[parent, l]
+                if components_u[m, l] < mutation_rate:
+                    value = min(max(value + noise[m, l], 0.0), 1.0)
+                new_receptors[row, l] = value
+                distance += (value - epitope[l]) ** 2
+            new_affinity[row] = np.exp(-np.sqrt(distance))
+            source[row] = parent
+            m += 1
+    return new_receptors, new_affinity, source
@@ -0,0 +1,65 @@
+# processes/matching.py
+import numpy as np
+from processes.affinity import compute_affinity_batch
+from utils import ensure_rng
+
+def match_bcells(receptors, epitopes, threshold, attempts=200, max_rounds=20, rng=None):
+    """
+    Asigna células B naive a antígenos en bloque, sin simpy.
+
+    Reproduce la política de `ImmuneSystem.fillCGs`: cada antígeno hace `attempts`
+    intentos; en cada uno toma una célula libre al azar y se la queda si la afinidad
+    supera `threshold`. Los intentos se resuelven en orden (paso de tiempo, antígeno),
+    de modo que si dos antígenos eligen la misma célula gana el primero, y el
+    perdedor vuelve a sortear otra célula libre, como con los locks de simpy.
+
+    Args:
+        receptors (np.ndarray): receptores de la reserva naive, forma (N, L).
+        epitopes (np.ndarray): epítopos de los antígenos, forma (A, L).
+        threshold (float): afinidad mínima para la unión.
+        attempts (int): intentos por antígeno (equivale a `until` de simpy).
+        max_rounds (int): máximo de rondas de re-sorteo para intentos en conflicto.
+        rng (np.random.Generator): fuente de aleatoriedad.
+
+    Returns:
+        (assigned, affinity): lista con los índices de células asignadas a cada
+        antígeno (en orden de llegada) y la matriz de afinidades (A, N).
+    """
+    rng = ensure_rng(rng)
+    receptors = np.asarray(receptors, dtype=np.float64)
+    epitopes = np.asarray(epitopes, dtype=np.float64)
+    n_antigens, n_cells = len(epitopes), len(receptors)
+
+    # Matriz completa antígeno x célula
+    affinity = compute_affinity_batch(receptors, epitopes)
+    eligible = affinity >= threshold
+
+    owner = np.full(n_cells, -1)
+    claim_order = np.full(n_cells, -1)
+    # Intentos ordenados por (paso de tiempo, antígeno)
+    slot_antigen = np.tile(np.arange(n_antigens), attempts)
+    slot_order = np.arange(attempts * n_antigens)
+    pending = slot_order
+
+    for _ in range(max_rounds):
+        free = np.flatnonzero(owner == -1)
+        if len(pending) == 0 or len(free) == 0:
+            break
+        candidates = free[rng.integers(len(free), size=len(pending))]
+        hits = eligible[slot_antigen[pending], candidates]
+
+        # Primer intento exitoso por célula (pending ya está en orden de llegada)
+        _, first = np.unique(np.where(hits, candidates, -1), return_index=True)
+        first = first[hits[first]]
+        owner[candidates[first]] = slot_antigen[pending[first]]
+        claim_order[candidates[first]] = pending[first]
+
+        # Intentos que eligieron una célula ya tomada por un intento anterior: re-sortear
+        taken = claim_order[candidates]
+        pending = pending[(taken >= 0) & (taken < pending)]
+
+    assigned = []
+    for a in range(n_antigens):
+        cells = np.flatnonzero(owner == a)
+        assigned.append(cells[np.argsort(claim_order[cells], kind="stable")])
+    return assigned, affinity
@@ -1,10 +1,10 @@
 # processes/mutation.py
-import random
 import numpy as np
 from agents.BCell import BCell
 from config import SIMULATION_PARAMS
+from utils import ensure_rng
 
-def mutate_bcell(bcell: BCell, mutation_rate=SIMULATION_PARAMS["mutation_rate"], mutation_strength=SIMULATION_PARAMS["mutation_strength"]):
+def mutate_bcell(bcell: BCell, mutation_rate=SIMULATION_PARAMS["mutation_rate"], mutation_strength=SIMULATION_PARAMS["mutation_strength"], rng=None):
     """
     Aplica hipermutación somática a la célula B modificando su vector receptor.
     
@@ -12,16 +12,18 @@ def mutate_bcell(bcell: BCell, mutation_rate=SIMULATION_PARAMS["mutation_rate"],
         bcell (BCell): célula B a mutar.
         mutation_rate (float): probabilidad de mutar cada componente del vector.
         mutation_strength (float): desviación estándar de la mutación gaussiana.
+        rng (np.random.Generator): fuente de aleatoriedad.
     
     Retorna:
         BCell mutada (nueva instancia o modificada in-place).
     """
+    rng = ensure_rng(rng)
     new_receptors = bcell.receptors.copy()
     
     for i in range(len(new_receptors)):
-        if random.random() < mutation_rate:
+        if rng.random() < mutation_rate:
             # Añade un cambio gaussiano pequeño
-            delta = np.random.normal(0, mutation_strength)
+            delta = rng.normal(0, mutation_strength)
             new_receptors[i] += delta
             # Opcional: limitar valores a rango válido (ej. 0 a 1)
             new_receptors[i] = min(max(new_receptors[i], 0.0), 1.0)
@@ -34,3 +36,28 @@ def mutate_bcell(bcell: BCell, mutation_rate=SIMULATION_PARAMS["mutation_rate"],
         serotype=bcell.serotype
     )
     return mutated_bcell
+
+def mutate_receptors(receptors, mutate_mask, mutation_rate=SIMULATION_PARAMS["mutation_rate"], mutation_strength=SIMULATION_PARAMS["mutation_strength"], rng=None):
+    """
+    Hipermutación somática sobre una población completa (versión vectorizada de `mutate_bcell`).
+    
+    Args:
+        receptors (np.ndarray): matriz de receptores, forma (N, L).
+        mutate_mask (np.ndarray): máscara booleana (N,) con las filas que generan un mutante.
+        mutation_rate (float): probabilidad de mutar cada componente del vector.
+        mutation_strength (float): desviación estándar de la mutación gaussiana.
+        rng (np.random.Generator): fuente de aleatoriedad.
+    
+    Retorna:
+        (new_receptors, parent_indices): receptores de los mutantes, forma (M, L), y el
+        índice de la fila padre de cada uno. `receptors` no se modifica.
+    """
+    rng = ensure_rng(rng)
+    parent_indices = np.flatnonzero(mutate_mask)
+    new_receptors = receptors[parent_indices]
+    
+    # Máscara Bernoulli por componente y ruido gaussiano, limitado a [0, 1] solo donde hubo mutación
+    components = rng.random(new_receptors.shape) < mutation_rate
+    noise = rng.normal(0, mutation_strength, new_receptors.shape)
+    np.copyto(new_receptors, np.clip(new_receptors + noise, 0.0, 1.0), where=components)
+    return new_receptors, parent_indices
@@ -1,8 +1,9 @@
 # processes/selection.py
 import numpy as np
 from config import SIMULATION_PARAMS
+from utils import ensure_rng
 
-def boltzmann_selection(bcells, temperature=SIMULATION_PARAMS["temperature"], max_survivors=None):
+def boltzmann_selection(bcells, temperature=SIMULATION_PARAMS["temperature"], max_survivors=None, rng=None):
     """
     Selección estocástica tipo Boltzmann basada en afinidad.
     
@@ -10,26 +11,118 @@ def boltzmann_selection(bcells, temperature=SIMULATION_PARAMS["temperature"], ma
         bcells (list): lista de objetos BCell con atributo 'affinity'.
         temperature (float): parámetro que regula la presión selectiva (menor temp = selección más estricta).
         max_survivors (int): número máximo de células que pueden sobrevivir (recurso limitado).
+        rng (np.random.Generator): fuente de aleatoriedad.
         
     Returns:
         list: células B seleccionadas para sobrevivir.
     """
     affinities = np.array([b.affinity for b in bcells])
+    selected_indices = boltzmann_indices(affinities, temperature=temperature, max_survivors=max_survivors, rng=rng)
     
-    # Evitar overflow: normalizar afinidades restando el máximo
-    affinities_norm = affinities - np.max(affinities)
+    selected = [bcells[i] for i in selected_indices]
+    return selected
+
+def boltzmann_indices(affinities, temperature=SIMULATION_PARAMS["temperature"], max_survivors=None, chunk_size=None, rng=None):
+    """
+    Igual que `boltzmann_selection` pero opera directamente sobre un arreglo de afinidades.
     
-    # Calcular probabilidades tipo Boltzmann
-    probs = np.exp(affinities_norm / temperature)
-    probs /= probs.sum()
+    Muestreo ponderado sin reemplazo por claves de Gumbel (Gumbel-top-k): a cada célula
+    se le asigna la clave affinity/temperature + Gumbel(0, 1) y sobreviven las
+    `max_survivors` claves mayores. Tiene la misma distribución que
+    np.random.choice(replace=False, p=probs) pero cuesta O(N), y al trabajar en escala
+    logarítmica no falla cuando muchas probabilidades se redondean a cero.
+    
+    Args:
+        affinities (np.ndarray): afinidades de la población.
+        temperature (float): parámetro que regula la presión selectiva.
+        max_survivors (int): número máximo de sobrevivientes.
+        chunk_size (int): si se indica, las claves se generan por bloques de ese tamaño
+            (ver `boltzmann_select_stream`).
+        rng (np.random.Generator): fuente de aleatoriedad.
+        
+    Returns:
+        np.ndarray: índices de las células seleccionadas.
+    """
+    rng = ensure_rng(rng)
+    affinities = np.asarray(affinities, dtype=float)
+    n = len(affinities)
     
     # Número de sobrevivientes
-    if max_survivors is None or max_survivors > len(bcells):
-        max_survivors = len(bcells)
+    if max_survivors is None or max_survivors > n:
+        max_survivors = n
+    if max_survivors <= 0:
+        return np.empty(0, dtype=int)
+    if max_survivors == n:
+        return np.arange(n)
     
-    # Selección sin reemplazo según probabilidades
-    selected_indices = np.random.choice(len(bcells), size=max_survivors, replace=False, p=probs)
+    if chunk_size is not None:
+        chunks = (affinities[start:start + chunk_size] for start in range(0, n, chunk_size))
+        return boltzmann_select_stream(chunks, temperature=temperature, max_survivors=max_survivors, rng=rng)
     
-    selected = [bcells[i] for i in selected_indices]
-    return selected
+    keys = _gumbel_keys(affinities, temperature, rng)
+    return np.argpartition(keys, n - max_survivors)[n - max_survivors:]
+
+def boltzmann_select_stream(chunks, temperature=SIMULATION_PARAMS["temperature"], max_survivors=None, rng=None):
+    """
+    Selección tipo Boltzmann sobre una secuencia de bloques de afinidades.
+    
+    Mantiene solo las `max_survivors` mejores claves vistas hasta el momento, así que la
+    memoria es O(bloque + max_survivors) aunque la población total no quepa de una vez.
+    
+    Args:
+        chunks (iterable): bloques consecutivos de afinidades (np.ndarray).
+        temperature (float): parámetro que regula la presión selectiva.
+        max_survivors (int): número máximo de sobrevivientes; None conserva todos.
+        rng (np.random.Generator): fuente de aleatoriedad.
+        
+    Returns:
+        np.ndarray: índices globales (posición en la concatenación de los bloques).
+    """
+    rng = ensure_rng(rng)
+    best_keys = np.empty(0)
+    best_indices = np.empty(0, dtype=int)
+    offset = 0
+    for chunk in chunks:
+        chunk = np.asarray(chunk, dtype=float)
+        keys = np.concatenate([best_keys, _gumbel_keys(chunk, temperature, rng)])
+        indices = np.concatenate([best_indices, np.arange(offset, offset + len(chunk))])
+        offset += len(chunk)
+        if max_survivors is not None and len(keys) > max_survivors:
+            top = np.argpartition(keys, len(keys) - max_survivors)[len(keys) - max_survivors:]
+            keys, indices = keys[top], indices[top]
+        best_keys, best_indices = keys, indices
+    return best_indices
+
+def boltzmann_group_indices(affinities, groups, max_survivors, temperature=SIMULATION_PARAMS["temperature"], rng=None):
+    """
+    `boltzmann_indices` aplicado por separado dentro de cada grupo, en una sola pasada.
+
+    Cada célula recibe su clave de Gumbel y sobreviven, en cada grupo g, las
+    `max_survivors[g]` claves mayores del grupo (todas si el grupo es más chico).
+
+    Args:
+        affinities (np.ndarray): afinidades de la población.
+        groups (np.ndarray): grupo de cada célula (enteros en [0, len(max_survivors))).
+        max_survivors (np.ndarray): máximo de sobrevivientes de cada grupo.
+        temperature (float): parámetro que regula la presión selectiva.
+        rng (np.random.Generator): fuente de aleatoriedad.
+
+    Returns:
+        np.ndarray: índices de las células seleccionadas.
+    """
+    rng = ensure_rng(rng)
+    affinities = np.asarray(affinities, dtype=float)
+    groups = np.asarray(groups)
+    if len(affinities) == 0:
+        return np.empty(0, dtype=int)
+    keys = _gumbel_keys(affinities, temperature, rng)
+    # Orden por grupo y, dentro de cada grupo, por clave descendente
+    order = np.lexsort((-keys, groups))
+    sorted_groups = groups[order]
+    starts = np.searchsorted(sorted_groups, sorted_groups, side="left")
+    rank = np.arange(len(order)) - starts
+    return order[rank < np.asarray(max_survivors)[sorted_groups]]
 
+def _gumbel_keys(affinities, temperature, rng):
+    # log(probs) + Gumbel; la constante de normalización no cambia el orden
+    return affinities / temperature + rng.gumbel(size=len(affinities))
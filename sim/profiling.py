@@ -0,0 +1,127 @@
+# profiling.py
+import csv
+import json
+import threading
+import time
+import tracemalloc
+
+class _Phase:
+    """Context manager que mide una fase y la acumula en el Profiler."""
+    __slots__ = ("profiler", "name", "serotype", "size", "start")
+
+    def __init__(self, profiler, name, serotype, size):
+        self.profiler = profiler
+        self.name = name
+        self.serotype = serotype
+        self.size = size
+
+    def __enter__(self):
+        if self.profiler.trace_memory:
+            tracemalloc.reset_peak()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        memory = tracemalloc.get_traced_memory() if self.profiler.trace_memory else None
+        self.profiler._record(self.name, self.serotype, seconds, self.size, memory)
+        return False
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_PHASE = _NullPhase()
+
+class NullProfiler:
+    """Profiler desactivado: `phase` devuelve siempre el mismo context manager vacío."""
+    enabled = False
+    day = 0
+
+    def phase(self, name, serotype="", size=None):
+        return _NULL_PHASE
+
+NULL_PROFILER = NullProfiler()
+
+class Profiler:
+    """
+    Instrumentación opcional de ImmuneSystem y GerminalCenter.
+
+    Acumula, por (día, fase, serotipo), el número de llamadas, el tiempo de pared y el
+    tamaño de la población al entrar a la fase. Es seguro con los CG avanzados en
+    paralelo (gc_workers > 1), aunque entonces la memoria de tracemalloc es la del
+    proceso, no la de cada fase. Con trace_memory=True también registra
+    la memoria actual y el pico de tracemalloc de cada fase (mucho más lento).
+
+    Uso:
+        profiler = Profiler()
+        immune_system = ImmuneSystem(antigens, [], params, profiler=profiler)
+        ...
+        profiler.save("perfil.json")
+    """
+    enabled = True
+
+    def __init__(self, trace_memory=False):
+        self.day = 0
+        self.trace_memory = trace_memory
+        self.records = {}
+        self._lock = threading.Lock()  # los CG pueden registrar desde varios hilos
+        self._started_tracemalloc = False
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+    def phase(self, name, serotype="", size=None):
+        return _Phase(self, name, serotype, size)
+
+    def _record(self, name, serotype, seconds, size, memory):
+        key = (self.day, name, serotype)
+        with self._lock:
+            rec = self.records.get(key)
+            if rec is None:
+                rec = self.records[key] = {"calls": 0, "seconds": 0.0, "size": 0, "memory_current": 0, "memory_peak": 0}
+            rec["calls"] += 1
+            rec["seconds"] += seconds
+            if size is not None:
+                rec["size"] = max(rec["size"], int(size))
+            if memory is not None:
+                rec["memory_current"] = memory[0]
+                rec["memory_peak"] = max(rec["memory_peak"], memory[1])
+
+    def to_records(self):
+        """Lista de filas {day, phase, serotype, calls, seconds, size, memory_current, memory_peak}."""
+        return [
+            dict(day=day, phase=phase, serotype=serotype, **rec)
+            for (day, phase, serotype), rec in sorted(self.records.items(), key=lambda item: item[0][0])
+        ]
+
+    def summary(self):
+        """Totales por fase: {fase: {"calls": ..., "seconds": ...}}."""
+        totals = {}
+        for (_, phase, _), rec in self.records.items():
+            total = totals.setdefault(phase, {"calls": 0, "seconds": 0.0})
+            total["calls"] += rec["calls"]
+            total["seconds"] += rec["seconds"]
+        return totals
+
+    def save(self, path):
+        """Exporta a CSV si la ruta termina en .csv, o a JSON en otro caso."""
+        rows = self.to_records()
+        if path.endswith(".csv"):
+            with open(path, "w", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=["day", "phase", "serotype", "calls", "seconds", "size", "memory_current", "memory_peak"])
+                writer.writeheader()
+                writer.writerows(rows)
+        else:
+            with open(path, "w") as f:
+                json.dump({"summary": self.summary(), "records": rows}, f, indent=1)
+
+    def close(self):
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
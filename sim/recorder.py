@@ -0,0 +1,108 @@
+# recorder.py
+import bisect
+import json
+import os
+import numpy as np
+
+def _gc_for(immune_system, serotype):
+    for gc in immune_system.gcs:
+        if gc.antigen.serotype == serotype:
+            return gc
+    return None
+
+def _gc_size(immune_system, serotype):
+    gc = _gc_for(immune_system, serotype)
+    return 0 if gc is None else gc.sizes()
+
+def _mean_affinity(immune_system, serotype):
+    gc = _gc_for(immune_system, serotype)
+    return np.nan if gc is None else gc.mean_affinity()
+
+# Observables disponibles: función (immune_system, serotipo) -> valor
+OBSERVABLES = {
+    "antibody": lambda ims, s: ims.antibody_levels[s],
+    "gc_size": _gc_size,
+    "memory": lambda ims, s: ims.memory_pool.count(s),
+    "plasma": lambda ims, s: ims.plasma_pool.count(s),
+    "mean_affinity": _mean_affinity,
+}
+
+class TrajectoryRecorder:
+    """
+    Registro columnar de observables en días de muestreo configurables.
+
+    Cada observable se guarda en su propio arreglo preasignado de forma
+    (réplica, serotipo, día de muestreo). Con `path` los arreglos son archivos .npy
+    mapeados en memoria dentro de ese directorio (uno por observable, más meta.json),
+    así que muchas réplicas largas se escriben a disco sin acumularse en RAM.
+
+    Args:
+        serotypes (list): serotipos, en el orden del eje 1.
+        days (iterable): días de muestreo.
+        observables (iterable): claves de OBSERVABLES.
+        replicates (int): tamaño del eje de réplicas.
+        path (str): directorio de salida; None guarda todo en memoria.
+    """
+
+    def __init__(self, serotypes, days, observables=("antibody",), replicates=1, path=None):
+        self.serotypes = list(serotypes)
+        self.days = sorted(set(int(d) for d in days))
+        self.observables = list(observables)
+        self.replicates = replicates
+        self.path = path
+        self.day_index = {day: i for i, day in enumerate(self.days)}
+        shape = (replicates, len(self.serotypes), len(self.days))
+
+        if path is None:
+            self.data = {obs: np.full(shape, np.nan) for obs in self.observables}
+        else:
+            os.makedirs(path, exist_ok=True)
+            self.data = {
+                obs: np.lib.format.open_memmap(os.path.join(path, f"{obs}.npy"), mode="w+", dtype=np.float64, shape=shape)
+                for obs in self.observables
+            }
+            for buffer in self.data.values():
+                buffer[:] = np.nan
+            with open(os.path.join(path, "meta.json"), "w") as f:
+                json.dump({"serotypes": self.serotypes, "days": self.days, "observables": self.observables, "replicates": replicates}, f)
+
+    def record(self, day, immune_system, replicate=0):
+        """
+        Guarda los observables del día si es un día de muestreo (si no, no hace nada).
+        Con una cohorte virtual (CohortImmuneSystem), `replicate` es un slice de filas.
+        """
+        column = self.day_index.get(day)
+        if column is None:
+            return
+        for obs in self.observables:
+            getter = OBSERVABLES[obs]
+            buffer = self.data[obs]
+            for row, serotype in enumerate(self.serotypes):
+                buffer[replicate, row, column] = getter(immune_system, serotype)
+
+    def next_day(self, day):
+        """Primer día de muestreo posterior a `day` (None si no quedan)."""
+        i = bisect.bisect_right(self.days, day)
+        return self.days[i] if i < len(self.days) else None
+
+    def store(self, replicate, values):
+        """Copia el resultado de una réplica corrida en otro proceso ({observable: (serotipo, día)})."""
+        for obs in self.observables:
+            self.data[obs][replicate] = values[obs]
+
+    def replicate(self, replicate=0):
+        """{observable: arreglo (serotipo, día)} de una réplica."""
+        return {obs: np.array(self.data[obs][replicate]) for obs in self.observables}
+
+    def flush(self):
+        if self.path is not None:
+            for buffer in self.data.values():
+                buffer.flush()
+
+    @staticmethod
+    def load(path, mmap_mode="r"):
+        """Abre un registro guardado en disco: (meta, {observable: arreglo})."""
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        data = {obs: np.load(os.path.join(path, f"{obs}.npy"), mmap_mode=mmap_mode) for obs in meta["observables"]}
+        return meta, data
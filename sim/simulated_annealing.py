@@ -1,10 +1,9 @@
-import math
-import random
+import os
+from functools import lru_cache
 import numpy as np
-from scipy.spatial import cKDTree
 from config import SIMULATION_PARAMS
-from main import sim
-import pandas as pd
+from main import SEROTYPES
+from calibration import anneal, DEFAULT_SPACE
 
 serotipos = {
     '1': ('pre PsC SP sp1', 'post PsC SP sp1'),
@@ -18,58 +17,74 @@ serotipos = {
 
 
 def vecino(parametros):
-    nuevo = parametros.copy()
-    # Modificar un parámetro aleatoriamente dentro de un rango
-    clave = random.choice(["plasma_production_factor", "memory_production_factor"])
-    delta = random.uniform(-0.005, 0.005)  # ajuste pequeño
-    nuevo[clave] = max(0, min(0.1, nuevo[clave] + delta))  # asegurar rango [0,1]
-    return nuevo
-
-def recocido_simulado(param_inicial, temp_inicial=1.0, temp_final=1e-1, alpha=0.9, max_iter=100):
-    estado_actual = param_inicial
-    res = sim(estado_actual, 48)
-    energia_actual = metrica(res)
-    T = temp_inicial
-    mejor_estado = estado_actual
-    mejor_energia = energia_actual
-
-    i = 0
-    while T > temp_final and i < max_iter:
-        print(f"etapa {i} del recocido")
-        print(f"Temperatura {T}")
-        i+=1
-        estado_nuevo = vecino(estado_actual)
-        resn = sim(estado_nuevo,48)
-        energia_nueva = metrica(resn)
-        delta = energia_nueva - energia_actual
-        if delta < 0 or random.random() < math.exp(-delta / T):
-            estado_actual = estado_nuevo
-            energia_actual = energia_nueva
-            if energia_nueva < mejor_energia:
-                mejor_estado = estado_nuevo
-                mejor_energia = energia_nueva
-                res = resn
-        T *= alpha  # enfriamiento
-    return mejor_estado, mejor_energia, res
-
-def metrica(antibodies):
-    df = pd.read_csv('sim/data/train_VCN7-Tf_fit.csv')
-    distancias_chamfer = 0
-
-    for serotipo, (col_pre, col_post) in serotipos.items():
-        # Extraer valores pre y post para ese serotipo
-        pre_vals = df[col_pre].values.reshape(-1, 1)
-        post_vals = df[col_post].values.reshape(-1, 1)
-        
-        points1 = [(pre_vals[i], post_vals[i]) for i in range(len(pre_vals))]
-        points2 = [(antibodies[i][serotipo][0], antibodies[i][serotipo][0]) for i in range(len(antibodies))]
+    # Modificar un parámetro aleatoriamente dentro de un rango (ver calibration.DEFAULT_SPACE)
+    return DEFAULT_SPACE.neighbor(parametros, np.random.default_rng())
+
+def recocido_simulado(param_inicial, temp_inicial=1.0, temp_final=1e-1, alpha=0.9, max_iter=100, workers=None,
+                      space=DEFAULT_SPACE, candidates=1, checkpoint=None, seed=None, cohort=False, cache=None):
+    """Calibra con `calibration.anneal` usando `metrica` como energía (48 réplicas por evaluación)."""
+    return anneal(param_inicial, metrica, space=space, replicates=48, candidates=candidates,
+                  temp_inicial=temp_inicial, temp_final=temp_final, alpha=alpha, max_iter=max_iter,
+                  workers=workers, seed=seed, checkpoint=checkpoint, cohort=cohort, cache=cache)
+
+def calibracion_surrogada(param_inicial, iterations=20, batch=4, initial=8, history=(), workers=None,
+                          space=DEFAULT_SPACE, checkpoint=None, seed=None, cohort=False, cache=None):
+    """
+    Calibra con `surrogate.surrogate_calibrate` (proceso gaussiano + mejora esperada)
+    usando `metrica` como energía; solo los candidatos prometedores se simulan (48
+    réplicas cada uno). `history` acepta pares (params, energía) ya evaluados, p. ej.
+    el "history" del checkpoint de un recocido.
+    """
+    from surrogate import surrogate_calibrate  # scipy.optimize/stats solo si se usa
+    return surrogate_calibrate(param_inicial, metrica, space=space, replicates=48, initial=initial,
+                               iterations=iterations, batch=batch, history=history, workers=workers,
+                               seed=seed, checkpoint=checkpoint, cohort=cohort, cache=cache)
 
-        distancias_chamfer += chamfer_distance(points1, points2)
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'train_VCN7-Tf_fit.csv')
 
-    return distancias_chamfer/7
+class CalibrationTarget:
+    """
+    Nubes de puntos observadas (pre, post) por serotipo y sus KD-trees.
+    
+    Se construye una sola vez; cada evaluación de `metrica` solo arma el árbol de los
+    puntos simulados y consulta.
+    """
+    def __init__(self, observed):
+        from scipy.spatial import cKDTree
+        self.observed = observed  # {serotipo: np.ndarray (N, 2)}
+        self.trees = {s: cKDTree(points) for s, points in observed.items()}
+
+    @classmethod
+    def from_csv(cls, path=DATA_PATH):
+        import pandas as pd  # solo para leer el CSV; las réplicas no lo necesitan
+        df = pd.read_csv(path)
+        return cls({
+            serotipo: np.column_stack([df[col_pre].values, df[col_post].values]).astype(float)
+            for serotipo, (col_pre, col_post) in serotipos.items()
+        })
+
+    def chamfer(self, serotipo, points):
+        from scipy.spatial import cKDTree
+        return _chamfer(self.observed[serotipo], self.trees[serotipo], points, cKDTree(points))
+
+@lru_cache(maxsize=None)
+def load_target(path=DATA_PATH):
+    """CalibrationTarget leído del CSV la primera vez y reutilizado después."""
+    return CalibrationTarget.from_csv(path)
+
+def metrica(antibodies, target=None):
+    """antibodies: resultado de run_ensemble, forma (réplica, serotipo, día de muestreo)."""
+    if target is None:
+        target = load_target()
+    distancias_chamfer = 0
 
+    for serotipo in serotipos:
+        sim_vals = antibodies[:, SEROTYPES.index(serotipo), 0]
+        points2 = np.column_stack([sim_vals, sim_vals])
 
+        distancias_chamfer += target.chamfer(serotipo, points2)
 
+    return distancias_chamfer/7
 
 
 def chamfer_distance(points1, points2):
@@ -79,12 +94,12 @@ def chamfer_distance(points1, points2):
     Devuelve un valor escalar que indica la similitud (menor es más parecido).
     """
     # print(np.squeeze(points1).shape)
+    from scipy.spatial import cKDTree
     points1 = np.squeeze(points1)
     points2 = np.squeeze(points2)
+    return _chamfer(points1, cKDTree(points1), points2, cKDTree(points2))
 
-    tree1 = cKDTree(points1)
-    tree2 = cKDTree(points2)
-
+def _chamfer(points1, tree1, points2, tree2):
     # Para cada punto en points1, distancia al punto más cercano en points2
     dist1, _ = tree2.query(points1)
     # Para cada punto en points2, distancia al punto más cercano en points1
@@ -98,13 +113,10 @@ def chamfer_distance(points1, points2):
 if __name__ == "__main__":
     a = recocido_simulado(SIMULATION_PARAMS)
     # print(a)
-    lista = a[2]
+    res = a[2]
     dictio = {}
     for s in serotipos.keys():
-        dictio[s] = []
-    for elem in lista:
-        for s in serotipos.keys():
-            dictio[s].append(elem[s])
+        dictio[s] = res[:, SEROTYPES.index(s)].tolist()
 
     with open("log_simulacion.txt", "w") as f:
         f.write(f"{dictio}")
\ No newline at end of file
@@ -0,0 +1,194 @@
+# surrogate.py
+import os
+import numpy as np
+from scipy.linalg import cho_factor, cho_solve
+from scipy.optimize import minimize
+from scipy.stats import norm
+from calibration import DEFAULT_SPACE, load_checkpoint, save_checkpoint, _stage_seed
+from ensemble import run_ensemble_batch
+
+class GaussianProcess:
+    """
+    Proceso gaussiano con kernel RBF de escalas por dimensión (ARD) y ruido blanco.
+
+    Las entradas se esperan en el cubo unitario (ver ParameterSpace.to_unit) y las
+    salidas se estandarizan. Los hiperparámetros (escalas, varianza de la señal y del
+    ruido) se ajustan maximizando la verosimilitud marginal; el ruido importa porque
+    cada energía viene de un número finito de réplicas.
+    """
+
+    # Rangos de los hiperparámetros, en escala log: escalas, varianza de señal, ruido
+    LENGTHSCALE = (1e-2, 1e1)
+    SIGNAL = (1e-2, 1e2)
+    NOISE = (1e-6, 1.0)
+
+    def __init__(self, restarts=3, rng=None):
+        self.restarts = restarts
+        self.rng = np.random.default_rng() if rng is None else rng
+        self.theta = None
+
+    def fit(self, X, y, optimize=True):
+        """Ajusta a (X (n, d), y (n,)); con optimize=False reutiliza los hiperparámetros."""
+        self.X = np.asarray(X, dtype=float)
+        y = np.asarray(y, dtype=float)
+        self.y_mean = y.mean()
+        self.y_std = y.std() if y.std() > 0 else 1.0
+        self.z = (y - self.y_mean) / self.y_std
+        if optimize or self.theta is None:
+            self.theta = self._optimize()
+        K = self._kernel(self.X, self.X, self.theta) + np.exp(self.theta[-1]) * np.eye(len(self.X))
+        self.chol = cho_factor(K, lower=True)
+        self.alpha = cho_solve(self.chol, self.z)
+        return self
+
+    def predict(self, X):
+        """Media y desvío estándar posteriores (en las unidades de y) en X (m, d)."""
+        X = np.asarray(X, dtype=float)
+        Ks = self._kernel(X, self.X, self.theta)
+        mean = Ks @ self.alpha
+        v = cho_solve(self.chol, Ks.T)
+        var = np.exp(self.theta[-2]) - np.einsum("ij,ji->i", Ks, v)
+        return self.y_mean + self.y_std * mean, self.y_std * np.sqrt(np.maximum(var, 1e-12))
+
+    @staticmethod
+    def _kernel(A, B, theta):
+        lengthscales = np.exp(theta[:-2])
+        d = (A[:, None, :] - B[None, :, :]) / lengthscales
+        return np.exp(theta[-2]) * np.exp(-0.5 * (d ** 2).sum(axis=-1))
+
+    def _neg_log_likelihood(self, theta):
+        K = self._kernel(self.X, self.X, theta) + np.exp(theta[-1]) * np.eye(len(self.X))
+        try:
+            L = cho_factor(K, lower=True)
+        except np.linalg.LinAlgError:
+            return 1e10
+        return 0.5 * self.z @ cho_solve(L, self.z) + np.log(np.diag(L[0])).sum()
+
+    def _optimize(self):
+        dims = self.X.shape[1]
+        bounds = [tuple(np.log(self.LENGTHSCALE))] * dims + [tuple(np.log(self.SIGNAL)), tuple(np.log(self.NOISE))]
+        starts = [np.array([np.log(0.3)] * dims + [0.0, np.log(1e-2)])]
+        starts += [np.array([self.rng.uniform(*b) for b in bounds]) for _ in range(self.restarts - 1)]
+        best = None
+        for x0 in starts:
+            result = minimize(self._neg_log_likelihood, x0, method="L-BFGS-B", bounds=bounds)
+            if best is None or result.fun < best.fun:
+                best = result
+        return best.x
+
+def expected_improvement(mean, std, best, xi=0.01):
+    """Mejora esperada (minimización) sobre `best`, con margen de exploración `xi`."""
+    improvement = best - mean - xi
+    z = improvement / std
+    return improvement * norm.cdf(z) + std * norm.pdf(z)
+
+def surrogate_minimize(evaluate, param_inicial, space=DEFAULT_SPACE, initial=8, iterations=20, batch=1,
+                       pool=2048, history=(), seed=None, checkpoint=None, verbose=True):
+    """
+    Minimización asistida por un proceso gaussiano.
+
+    Cada iteración ajusta el GP a todos los puntos evaluados, sortea `pool` candidatos
+    (uniformes en el espacio y alrededor del mejor) y evalúa con el simulador solo los
+    `batch` de mayor mejora esperada. Dentro de un lote, cada elegido se agrega al GP con
+    la media predicha como valor provisional para que el siguiente no caiga en el mismo
+    lugar.
+
+    Args:
+        evaluate: función (lista de juegos de parámetros, rng) -> lista de (energía,
+            resultado); menor energía es mejor. `rng` es el generador del proceso (se
+            guarda en el checkpoint), p. ej. para derivar las semillas de las réplicas.
+        param_inicial (dict): parámetros base; los no calibrados se copian de aquí.
+        space (ParameterSpace): parámetros a calibrar y sus rangos.
+        initial (int): puntos del diseño inicial (hipercubo latino), además de
+            `param_inicial`.
+        iterations (int): iteraciones de adquisición.
+        batch (int): evaluaciones reales por iteración (se corren juntas).
+        history: pares (params, energía) ya evaluados, p. ej. el historial de un
+            recocido; se usan para ajustar el GP sin volver a simularlos, salvo el
+            mejor, que se simula una vez para tener su resultado.
+        checkpoint (str): ruta del checkpoint; si existe se reanuda desde él.
+
+    Returns:
+        dict con "best", "best_energy", "best_result", "history" y "iteration"; "best"
+        es el mejor punto simulado por esta llamada (nunca solo uno de `history`).
+    """
+    if checkpoint is not None and os.path.exists(checkpoint):
+        state = load_checkpoint(checkpoint)
+        rng = np.random.default_rng()
+        rng.bit_generator.state = state["rng_state"]
+    else:
+        rng = np.random.default_rng(seed)
+        state = {"iteration": 0, "best": None, "best_energy": np.inf, "best_result": None, "history": list(history)}
+        # El mejor de `history` se vuelve a simular con el diseño inicial: el mejor que se
+        # devuelve es siempre un punto simulado aquí, con su resultado
+        design = [param_inicial]
+        if state["history"]:
+            design.append(min(state["history"], key=lambda item: item[1])[0])
+        design += [space.from_unit(u, param_inicial) for u in _latin_hypercube(initial, len(space.names), rng)]
+        _evaluate_into(state, evaluate, design, rng)
+        _save(checkpoint, state, rng)
+
+    gp = GaussianProcess(rng=rng)
+    while state["iteration"] < iterations:
+        state["iteration"] += 1
+        X = np.array([space.to_unit(p) for p, _ in state["history"]])
+        y = np.array([e for _, e in state["history"]])
+        gp.fit(X, y)
+        incumbent = gp.predict(X)[0].min()  # con ruido, la mejor media es más estable que el mejor y
+
+        candidates = np.vstack([
+            rng.random((pool // 2, X.shape[1])),
+            np.clip(space.to_unit(state["best"]) + rng.normal(0, 0.05, (pool - pool // 2, X.shape[1])), 0, 1),
+        ])
+        chosen = []
+        for _ in range(batch):
+            mean, std = gp.predict(candidates)
+            k = int(np.argmax(expected_improvement(mean, std, incumbent)))
+            chosen.append(candidates[k])
+            # Valor provisional: la media predicha, sin reoptimizar hiperparámetros
+            X = np.vstack([X, candidates[k]])
+            y = np.append(y, mean[k])
+            gp.fit(X, y, optimize=False)
+            candidates = np.delete(candidates, k, axis=0)
+
+        _evaluate_into(state, evaluate, [space.from_unit(u, param_inicial) for u in chosen], rng)
+        if verbose:
+            print(f"iteración {state['iteration']}: mejor energía {state['best_energy']}")
+        _save(checkpoint, state, rng)
+    return state
+
+def surrogate_calibrate(param_inicial, objective, space=DEFAULT_SPACE, replicates=48, initial=8, iterations=20,
+                        batch=1, history=(), workers=None, seed=None, checkpoint=None, verbose=True, cohort=False, cache=None):
+    """
+    Calibración con `surrogate_minimize`, evaluando cada candidato como `anneal`:
+    `replicates` réplicas con run_ensemble_batch (con `cache`, si se indica) y
+    `objective` sobre el resultado.
+
+    Returns:
+        (mejor_estado, mejor_energia, res), como `calibration.anneal`.
+    """
+    def evaluate(params_list, rng):
+        results = run_ensemble_batch(params_list, replicates, workers=workers, seeds=[_stage_seed(rng) for _ in params_list], cohort=cohort, cache=cache)
+        return [(objective(res), res) for res in results]
+
+    state = surrogate_minimize(evaluate, param_inicial, space=space, initial=initial, iterations=iterations, batch=batch,
+                               history=history, seed=seed, checkpoint=checkpoint, verbose=verbose)
+    return state["best"], state["best_energy"], state["best_result"]
+
+def _evaluate_into(state, evaluate, params_list, rng):
+    for params, (energy, result) in zip(params_list, evaluate(params_list, rng)):
+        state["history"].append((params, energy))
+        if energy < state["best_energy"]:
+            state["best"], state["best_energy"], state["best_result"] = params, energy, result
+
+def _latin_hypercube(n, dims, rng):
+    # Un punto por estrato en cada dimensión, con los estratos permutados al azar
+    u = (np.arange(n)[:, None] + rng.random((n, dims))) / max(n, 1)
+    for d in range(dims):
+        u[:, d] = rng.permutation(u[:, d])
+    return u
+
+def _save(checkpoint, state, rng):
+    if checkpoint is not None:
+        state["rng_state"] = rng.bit_generator.state
+        save_checkpoint(checkpoint, state)
@@ -0,0 +1,12 @@
+# utils.py
+import numpy as np
+
+def ensure_rng(rng=None) -> np.random.Generator:
+    """Devuelve `rng`, o un Generator nuevo sin semilla si no se pasó ninguno."""
+    if rng is None:
+        return np.random.default_rng()
+    return rng
+
+def spawn_rngs(rng: np.random.Generator, n: int):
+    """`n` Generators hijos independientes (SeedSequence.spawn), p. ej. uno por centro germinal."""
+    return rng.spawn(n)